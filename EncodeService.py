@@ -0,0 +1,340 @@
+# encode_service.py
+
+import io
+import copy
+import json
+import math
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from RenderCache import render_key
+from EncoderJobs import load_encoder
+
+CONTENT_TYPES = {"pdf": "application/pdf", "png": "image/png", "svg": "image/svg+xml"}
+MODES = ("encoded", "solution", "abc")
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+    504: "Gateway Timeout",
+}
+CHUNK_SIZE = 64 * 1024
+# Espaciado máximo, en tamaños de letra; más allá no cabe ni una letra o una línea por página
+MAX_SPACING = 10.0
+
+
+class RequestError(Exception):
+    """Error de una petición, con el código HTTP que se devuelve al cliente."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def response_head(status, headers):
+    """Línea de estado y cabeceras de una respuesta HTTP/1.1."""
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}"]
+    lines.extend(f"{name}: {value}" for name, value in headers.items())
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+def json_body(data):
+    return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+
+class EncodeService:
+    """
+    Servicio de cifrado de larga duración. Mantiene un encoder cargado por
+    cada (backend, keymap, tamaño) y dibuja en un pool de hilos acotado;
+    el número de peticiones en curso y su duración también están acotados.
+    Los PDF se dibujan con ReportLab y los PNG/SVG con el backend directo,
+    que no comparten estado global entre hilos (matplotlib sí).
+    Con `cache` (un RenderCache) las salidas repetidas no se vuelven a dibujar.
+    """
+
+    def __init__(self, keymaps=None, workers=4, max_concurrent=8, timeout=30.0, max_body=1 << 20, max_size=200, cache=None):
+        # Sólo se aceptan keymaps registrados (nombre -> archivo), nunca rutas del cliente
+        self.keymaps = dict(keymaps or {"default": "keymap.json"})
+        self.default_keymap = next(iter(self.keymaps))
+        self.timeout = timeout
+        self.max_body = max_body
+        self.max_size = max_size
+        self.max_concurrent = max_concurrent
+        self.cache = cache
+
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="encode")
+        self.slots = asyncio.Semaphore(max_concurrent)
+        self.active = 0
+        self.encoders = {}
+        self.encoders_lock = threading.Lock()
+
+    def encoder(self, backend, keymap, size):
+        """Devuelve el encoder (ya cargado) de un backend, keymap y tamaño."""
+        key = (backend, keymap, size)
+        with self.encoders_lock:
+            if key not in self.encoders:
+                self.encoders[key] = load_encoder(backend, self.keymaps[keymap], size)
+            return self.encoders[key]
+
+    def warm(self, sizes=(50,)):
+        """Carga de antemano los encoders de todos los keymaps para los tamaños dados."""
+        for keymap in self.keymaps:
+            for size in sizes:
+                for backend in ("reportlab", "direct"):
+                    self.encoder(backend, keymap, size)
+
+    def parse_params(self, body):
+        """
+        Valida el cuerpo JSON de una petición de cifrado y devuelve sus
+        parámetros con los valores por defecto del CLI.
+        """
+        try:
+            data = json.loads(body or b"{}")
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise RequestError(400, f"JSON inválido: {e}")
+        if not isinstance(data, dict):
+            raise RequestError(400, "El cuerpo debe ser un objeto JSON.")
+
+        def number(name, kind, default, minimum, maximum=None):
+            value = data.get(name, default)
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or (kind is int and not isinstance(value, int)):
+                raise RequestError(400, f"'{name}' debe ser un número.")
+            # json.loads acepta NaN e Infinity, que no cumplen ni fallan las comparaciones
+            if isinstance(value, float) and not math.isfinite(value):
+                raise RequestError(400, f"'{name}' debe ser un número finito.")
+            if value < minimum:
+                raise RequestError(400, f"'{name}' debe ser al menos {minimum}.")
+            if maximum is not None and value > maximum:
+                raise RequestError(400, f"'{name}' no puede ser mayor que {maximum}.")
+            return kind(value)
+
+        params = {
+            "text": data.get("text", ""),
+            "keymap": data.get("keymap", self.default_keymap),
+            "output": data.get("output", "encoded"),
+            "format": data.get("format", "pdf"),
+            "size": number("size", int, 50, 1),
+            "letter_spacing": number("letter_spacing", float, 0.4, 0.01, MAX_SPACING),
+            "line_spacing": number("line_spacing", float, 0.6, 0.01, MAX_SPACING),
+            "page": number("page", int, 1, 1),
+        }
+        if not isinstance(params["text"], str):
+            raise RequestError(400, "'text' debe ser una cadena.")
+        try:
+            params["text"].encode("utf-8")
+        except UnicodeEncodeError:
+            # JSON admite sustitutos sueltos (\ud800) que no son texto válido
+            raise RequestError(400, "'text' tiene caracteres que no se pueden codificar en UTF-8.")
+        if params["keymap"] not in self.keymaps:
+            raise RequestError(400, f"Keymap desconocido: '{params['keymap']}'")
+        if params["output"] not in MODES:
+            raise RequestError(400, f"'output' debe ser uno de: {', '.join(MODES)}")
+        if params["format"] not in CONTENT_TYPES:
+            raise RequestError(400, f"'format' debe ser uno de: {', '.join(CONTENT_TYPES)}")
+        if params["size"] > self.max_size:
+            raise RequestError(400, f"'size' no puede ser mayor que {self.max_size}.")
+        return params
+
+    def render(self, params):
+        """
+        Dibuja una salida en el hilo del pool y devuelve (bytes, cabeceras extra).
+        El PDF lleva todas las páginas; PNG y SVG sólo la página pedida.
+        """
+        backend = "reportlab" if params["format"] == "pdf" else "direct"
+        encoder = self.encoder(backend, params["keymap"], params["size"])
+        if self.cache is None:
+            return self.draw(encoder, params)
+
+        key = render_key(
+            encoder,
+            params["text"],
+            params["output"],
+            params["format"],
+            params["letter_spacing"],
+            params["line_spacing"],
+            params["page"] if params["format"] != "pdf" else 1,
+        )
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        result = self.draw(encoder, params)
+        self.cache.put(key, result)
+        return result
+
+    def draw(self, encoder, params):
+        """Hace el layout y dibuja la salida pedida con el encoder dado."""
+        input_content = params["text"].splitlines()
+
+        if params["format"] == "pdf":
+            buffer = io.BytesIO()
+            encoder.render_output(params["output"], buffer, input_content, params["letter_spacing"], params["line_spacing"])
+            return buffer.getvalue(), {}
+
+        # El backend directo guarda las páginas en el encoder: cada petición usa su copia
+        encoder = copy.copy(encoder)
+        encoder.generate_output(params["output"], input_content, params["letter_spacing"], params["line_spacing"])
+        encoder.pages = list(encoder.pages)
+        page_count = len(encoder.pages)
+        if params["page"] > page_count:
+            raise RequestError(404, f"La salida tiene {page_count} páginas.")
+
+        encoder.pages = encoder.pages[params["page"] - 1:params["page"]]
+        content = next(encoder.output_pages("." + params["format"]))
+        return content, {"X-Page-Count": str(page_count)}
+
+    async def encode(self, params):
+        """
+        Atiende una petición de cifrado respetando el límite de concurrencia
+        y el tiempo máximo, que cuenta desde que llega la petición.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+
+        try:
+            await asyncio.wait_for(self.slots.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            raise RequestError(503, "Servicio ocupado, intente más tarde.")
+
+        self.active += 1
+        future = loop.run_in_executor(self.pool, self.render, params)
+
+        def release(_):
+            self.active -= 1
+            self.slots.release()
+
+        # El cupo se libera cuando termina el dibujo, aunque la petición ya haya expirado
+        future.add_done_callback(release)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), max(0.0, deadline - loop.time()))
+        except asyncio.TimeoutError:
+            # Si todavía no empezó a dibujarse, no llega a ejecutarse
+            future.cancel()
+            raise RequestError(504, f"La petición superó el tiempo máximo ({self.timeout} s).")
+
+    async def dispatch(self, method, path, body=b""):
+        """
+        Atiende una petición ya leída y devuelve (estado, cabeceras, cuerpo).
+        """
+        try:
+            if path == "/health":
+                if method != "GET":
+                    raise RequestError(405, "Use GET.")
+                data = {"status": "ok", "encoders": len(self.encoders), "active": self.active, "max_concurrent": self.max_concurrent}
+                if self.cache is not None:
+                    data["cache"] = self.cache.stats()
+                return 200, {"Content-Type": "application/json"}, json_body(data)
+
+            if path == "/encode":
+                if method != "POST":
+                    raise RequestError(405, "Use POST.")
+                params = self.parse_params(body)
+                content, headers = await self.encode(params)
+                headers = {"Content-Type": CONTENT_TYPES[params["format"]], **headers}
+                return 200, headers, content
+
+            raise RequestError(404, f"Ruta desconocida: {path}")
+        except RequestError as e:
+            return e.status, {"Content-Type": "application/json"}, json_body({"error": str(e)})
+        except Exception as e:
+            print(f"Error al atender {method} {path}: {e!r}")
+            return 500, {"Content-Type": "application/json"}, json_body({"error": "Error interno."})
+
+    async def read_request(self, reader):
+        """
+        Lee una petición HTTP/1.1 y devuelve (método, ruta, cuerpo).
+        """
+        request_line = await reader.readline()
+        try:
+            method, target, _ = request_line.decode("latin-1").split()
+        except ValueError:
+            raise RequestError(400, "Línea de petición inválida.")
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise RequestError(400, "Content-Length inválido.")
+        if length > self.max_body:
+            raise RequestError(413, f"El cuerpo supera {self.max_body} bytes.")
+
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target.split("?", 1)[0], body
+
+    async def handle_connection(self, reader, writer):
+        """Atiende una conexión: una petición, una respuesta y se cierra."""
+        try:
+            try:
+                method, path, body = await asyncio.wait_for(self.read_request(reader), self.timeout)
+                status, headers, content = await self.dispatch(method, path, body)
+            except RequestError as e:
+                status, headers, content = e.status, {"Content-Type": "application/json"}, json_body({"error": str(e)})
+
+            headers = {**headers, "Content-Length": str(len(content)), "Connection": "close"}
+            writer.write(response_head(status, headers))
+            # El cuerpo se envía por partes para no acumular todo en el buffer del socket
+            for start in range(0, len(content), CHUNK_SIZE):
+                writer.write(content[start:start + CHUNK_SIZE])
+                await writer.drain()
+            await writer.drain()
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        """Escucha peticiones HTTP hasta que se interrumpe el proceso."""
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"Servicio escuchando en http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+
+class LocalClient:
+    """
+    Cliente en el mismo proceso: arma la petición HTTP y la pasa por el
+    mismo lector y despachador que el servidor, sin abrir sockets.
+    Útil para probar el servicio sin acceso a la red.
+    """
+
+    def __init__(self, service):
+        self.service = service
+
+    async def request(self, method, path, payload=None):
+        """Devuelve (estado, cabeceras, cuerpo) de una petición."""
+        body = b"" if payload is None else json_body(payload)
+        raw = f"{method} {path} HTTP/1.1\r\nHost: local\r\nContent-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+
+        reader = asyncio.StreamReader()
+        reader.feed_data(raw)
+        reader.feed_eof()
+        try:
+            method, path, body = await self.service.read_request(reader)
+        except RequestError as e:
+            return e.status, {"Content-Type": "application/json"}, json_body({"error": str(e)})
+        return await self.service.dispatch(method, path, body)
+
+    async def encode(self, text="", **params):
+        """Cifra un texto y devuelve los bytes de la salida; lanza RequestError si falla."""
+        status, headers, content = await self.request("POST", "/encode", {"text": text, **params})
+        if status != 200:
+            raise RequestError(status, json.loads(content)["error"])
+        return content
@@ -0,0 +1,41 @@
+# encoder_jobs.py
+
+from Instrumentation import instrumentation, collect
+
+
+def load_encoder(backend, keymap_file, size):
+    """
+    Crea el encoder del backend pedido ('matplotlib', 'reportlab' o 'direct').
+    El backend se importa sólo cuando se va a usar.
+    """
+    if backend == "matplotlib":
+        from SymbolicEncoder import SymbolicEncoder
+    elif backend == "reportlab":
+        from SymbolicEncoderReportLab import SymbolicEncoder
+    elif backend == "direct":
+        from SymbolicEncoderDirect import SymbolicEncoder
+    else:
+        raise ValueError(f"Backend desconocido: '{backend}'")
+    return SymbolicEncoder(keymap_file=keymap_file, size=size)
+
+
+def run_jobs(jobs, workers):
+    """
+    Ejecuta los trabajos (mensaje, función, argumentos) en serie o en un pool
+    de procesos; lo que mide cada worker se suma a la instrumentación local.
+    """
+    if workers <= 1:
+        for message, function, kwargs in jobs:
+            print(message)
+            function(**kwargs)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = []
+        for message, function, kwargs in jobs:
+            print(message)
+            futures.append(pool.submit(collect, instrumentation.mode, function, kwargs))
+        for future in futures:
+            instrumentation.merge(future.result())
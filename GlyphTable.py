@@ -0,0 +1,235 @@
+# glyph_table.py
+
+import unicodedata
+import numpy as np
+from Instrumentation import instrumentation
+
+# Los glifos se codifican como caracteres del área de uso privado: chr(GLYPH_BASE + id)
+GLYPH_BASE = 0xE000
+
+# Trazos por defecto (x1, y1, x2, y2) en unidades de tamaño 50; el keymap puede añadir o redefinir trazos
+DEFAULT_LINES_MAP = {
+    "bottom_left":    [10, 30, 20, 15],
+    "bottom_right":   [30, 30, 20, 15],
+    "center":         [10, 30, 30, 30],
+    "top_left":       [10, 30, 20, 45],
+    "top_right":      [30, 30, 20, 45],
+}
+
+# Cada trazo es un bit del código del glifo al decodificar
+MAX_STROKES = 16
+
+
+class KeymapError(ValueError):
+    """El keymap no es válido; el mensaje lista todos los problemas encontrados."""
+
+
+def normalize_char(c):
+    """Cómo queda un carácter tras la normalización del texto (sin acentos, en minúscula)."""
+    return "".join(d for d in unicodedata.normalize('NFKD', c) if not unicodedata.combining(d)).lower()
+
+
+def compile_keymap(data, lines_map=DEFAULT_LINES_MAP):
+    """
+    Valida un keymap y devuelve (letras, trazos). Acepta el formato antiguo
+    {letra: [trazos]} o {"strokes": {nombre: [x1, y1, x2, y2]}, "letters": {letra: [trazos]}},
+    cuyos trazos se suman a `lines_map`. Todos los problemas se reúnen en un
+    único KeymapError: trazos desconocidos o mal definidos, letras sin trazos
+    y letras con los mismos trazos, que no se podrían decodificar.
+    """
+    if not isinstance(data, dict):
+        raise KeymapError("El keymap debe ser un objeto JSON.")
+
+    if "letters" in data:
+        letters = data["letters"]
+        extra_strokes = data.get("strokes", {})
+        if not isinstance(extra_strokes, dict):
+            raise KeymapError("'strokes' debe ser un objeto {nombre: [x1, y1, x2, y2]}.")
+        strokes = {**lines_map, **extra_strokes}
+    else:
+        letters = data
+        strokes = dict(lines_map)
+
+    errors = []
+    if not isinstance(letters, dict):
+        raise KeymapError("'letters' debe ser un objeto {letra: [trazos]}.")
+
+    for name, line in strokes.items():
+        if not (isinstance(line, (list, tuple)) and len(line) == 4 and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in line)):
+            errors.append(f"el trazo '{name}' debe ser [x1, y1, x2, y2]")
+    if len(strokes) > MAX_STROKES:
+        errors.append(f"hay {len(strokes)} trazos; el máximo es {MAX_STROKES}")
+
+    owners = {}
+    for letter_char, line_keys in letters.items():
+        if not isinstance(letter_char, str) or len(letter_char) != 1 or letter_char.isspace():
+            errors.append(f"'{letter_char}' no es un único carácter visible")
+            continue
+        if not isinstance(line_keys, list) or not all(isinstance(line_key, str) for line_key in line_keys):
+            errors.append(f"los trazos de '{letter_char}' deben ser una lista de nombres")
+            continue
+        if normalize_char(letter_char) != letter_char:
+            print(f"Advertencia: '{letter_char}' nunca aparece en el texto normalizado (se lee '{normalize_char(letter_char)}')")
+
+        unknown = [line_key for line_key in line_keys if line_key not in strokes]
+        if unknown:
+            errors.append(f"'{letter_char}' usa trazos desconocidos: {', '.join(map(repr, unknown))}")
+        elif not line_keys:
+            errors.append(f"'{letter_char}' no tiene trazos y se confundiría con un espacio")
+        elif len(set(line_keys)) != len(line_keys):
+            errors.append(f"'{letter_char}' repite trazos")
+        else:
+            owners.setdefault(frozenset(line_keys), []).append(letter_char)
+
+    for chars in owners.values():
+        if len(chars) > 1:
+            errors.append(f"las letras {', '.join(sorted(chars))} tienen los mismos trazos")
+
+    if errors:
+        raise KeymapError("Keymap inválido:\n  " + "\n  ".join(errors))
+
+    return {letter_char: list(line_keys) for letter_char, line_keys in letters.items()}, {name: list(line) for name, line in strokes.items()}
+
+
+def word_offsets(lengths):
+    """
+    Dado el número de glifos de cada palabra, devuelve para cada glifo
+    el índice de su palabra y su posición dentro de ella.
+    """
+    lengths = np.asarray(lengths, dtype=np.intp)
+    owner = np.repeat(np.arange(len(lengths)), lengths)
+    starts = np.cumsum(lengths) - lengths
+    within = np.arange(int(lengths.sum())) - starts[owner]
+    return owner, within
+
+
+class TranslationTable(dict):
+    """
+    Tabla para str.translate que se completa la primera vez que ve cada
+    carácter: quita los acentos (NFKD sin marcas combinantes) y cambia cada
+    letra del keymap por su glifo. El resto de caracteres se conserva.
+    """
+
+    def __init__(self, ids):
+        super().__init__()
+        self.ids = ids
+
+    def __missing__(self, code_point):
+        translated = []
+        for c in unicodedata.normalize('NFKD', chr(code_point)):
+            if unicodedata.combining(c):
+                continue
+            glyph_id = self.ids.get(c.lower())
+            if glyph_id is not None:
+                translated.append(chr(GLYPH_BASE + glyph_id))
+            elif GLYPH_BASE <= ord(c) < GLYPH_BASE + len(self.ids):
+                # Un carácter privado del texto no debe confundirse con un glifo
+                translated.append('\ufffd')
+            else:
+                translated.append(c)
+        self[code_point] = ''.join(translated)
+        return self[code_point]
+
+
+class GlyphTable:
+    """
+    Tabla compilada de glifos: para cada carácter del keymap guarda sus
+    segmentos ya escalados a `size`, relativos a (x, baseline_y).
+    El keymap y sus trazos ya vienen validados por compile_keymap.
+    """
+
+    def __init__(self, keymap, lines_map, size):
+        self.size = size
+        self.lines_map = lines_map
+        scale = size / 50  # Escala base
+
+        # El id de cada glifo es su posición en `chars`
+        self.chars = sorted(keymap)
+        self.ids = {char: glyph_id for glyph_id, char in enumerate(self.chars)}
+        self.translation = TranslationTable(self.ids)
+        # Borra glifos y espacios: lo que queda de una línea son letras desconocidas
+        self.known = dict.fromkeys(range(GLYPH_BASE, GLYPH_BASE + len(self.chars)))
+        self.known[ord(' ')] = None
+        # Letras desconocidas ya avisadas: cada una se avisa una sola vez
+        self.reported = set()
+
+        segments = []
+        counts = []
+        for char in self.chars:
+            for line_key in keymap[char]:
+                x1, y1, x2, y2 = lines_map[line_key]
+                segments.append((x1 * scale, -y1 * scale, x2 * scale, -y2 * scale))
+            counts.append(len(keymap[char]))
+
+        self.segments = np.array(segments, dtype=float).reshape(-1, 4)
+        self.counts = np.array(counts, dtype=np.intp)
+        self.offsets = np.concatenate(([0], np.cumsum(self.counts)))
+
+    def __len__(self):
+        return len(self.chars)
+
+    def encode_line(self, text_line):
+        """
+        Normaliza una línea y la separa en palabras. Devuelve la línea
+        normalizada, sus palabras y cuántos glifos tiene cada una; avisa
+        una vez de cada letra que no está en el keymap, o la cuenta si la
+        instrumentación está encendida.
+        """
+        text_line = text_line.translate(self.translation)
+        if not text_line:
+            return text_line, [], []
+
+        words = text_line.split(" ")
+        if not text_line.translate(self.known):
+            # Caso habitual: la línea sólo tiene glifos y espacios
+            return text_line, words, [len(word) for word in words]
+
+        counts = []
+        for word in words:
+            unknown = word.translate(self.known)
+            if instrumentation.enabled:
+                instrumentation.unmapped(unknown)
+                unknown_letters = ()
+            else:
+                unknown_letters = dict.fromkeys(unknown)
+            for letter in unknown_letters:
+                if letter in self.reported:
+                    continue
+                self.reported.add(letter)
+                print(f"Letra no encontrada en keymap: '{letter}'")
+            counts.append(len(word) - len(unknown))
+        return text_line, words, counts
+
+    def glyph_ids(self, text):
+        """
+        Devuelve los ids de glifo de un texto ya normalizado, en orden.
+        """
+        codes = np.frombuffer(text.encode('utf-32-le'), dtype='<u4').astype(np.intp) - GLYPH_BASE
+        return codes[(codes >= 0) & (codes < len(self.chars))]
+
+    def captions(self, glyph_ids):
+        """Devuelve la letra en mayúscula de cada glifo."""
+        return [self.chars[glyph_id].upper() for glyph_id in glyph_ids]
+
+    def place(self, glyph_ids, x, y):
+        """
+        Coloca los glifos en las posiciones (x, y) y devuelve todos sus
+        segmentos como un arreglo (N, 4) de (x1, y1, x2, y2).
+        """
+        glyph_ids = np.asarray(glyph_ids, dtype=np.intp)
+        owner, within = word_offsets(self.counts[glyph_ids])
+        segments = self.segments[self.offsets[glyph_ids][owner] + within]
+        segments[:, 0::2] += np.asarray(x, dtype=float)[owner, None]
+        segments[:, 1::2] += np.asarray(y, dtype=float)[owner, None]
+        return segments
+
+
+def page_slices(pages):
+    """
+    Dada la página de cada glifo (en orden no decreciente), devuelve un
+    slice por página. Siempre hay al menos una página.
+    """
+    pages = np.asarray(pages, dtype=np.intp)
+    count = int(pages[-1]) + 1 if len(pages) else 1
+    bounds = np.searchsorted(pages, np.arange(count + 1))
+    return [slice(int(start), int(stop)) for start, stop in zip(bounds[:-1], bounds[1:])]
@@ -0,0 +1,27 @@
+# input_reader.py
+
+
+def read_lines(input_file):
+    """
+    Abre un archivo de texto UTF-8 y devuelve un generador de sus líneas.
+    El archivo se lee a medida que se consume, sin cargarlo entero en memoria.
+    """
+    try:
+        file = open(input_file, "r", encoding="utf-8-sig")
+    except FileNotFoundError:
+        print(f"El archivo {input_file} no se encuentra.")
+        raise
+    except Exception as e:
+        print(f"Error al leer el archivo {input_file}: {e}")
+        raise
+    return iter_lines(file, input_file)
+
+
+def iter_lines(file, input_file):
+    """Recorre las líneas del archivo abierto y lo cierra al terminar."""
+    with file:
+        try:
+            yield from file
+        except UnicodeDecodeError as e:
+            print(f"El archivo {input_file} no es UTF-8 válido: {e}")
+            raise
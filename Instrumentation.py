@@ -0,0 +1,144 @@
+# instrumentation.py
+
+import json
+import time
+import logging
+import functools
+from contextlib import contextmanager, nullcontext
+
+logger = logging.getLogger("triangles_cypher")
+
+MODES = ("off", "summary", "json")
+
+# Contexto vacío que se reutiliza cuando la instrumentación está apagada
+NULL_STAGE = nullcontext()
+
+
+class Instrumentation:
+    """
+    Tiempos por etapa, contadores (caracteres, glifos, páginas) y letras
+    sin glifo agregadas, con hooks opcionales que reciben cada evento.
+    Apagada (modo 'off' y sin hooks) sólo cuesta leer `enabled`.
+    """
+
+    def __init__(self):
+        self.mode = "off"
+        self.enabled = False
+        self.hooks = []
+        self.reset()
+
+    def reset(self):
+        self.timers = {}
+        self.counters = {}
+        self.unmapped_letters = {}
+
+    def configure(self, mode):
+        """Elige el modo ('off', 'summary' o 'json') y borra lo acumulado."""
+        if mode not in MODES:
+            raise ValueError(f"Modo de instrumentación desconocido: '{mode}'")
+        self.mode = mode
+        self.enabled = mode != "off" or bool(self.hooks)
+        self.reset()
+
+    def add_hook(self, hook):
+        """Registra una función que recibe cada evento como diccionario."""
+        self.hooks.append(hook)
+        self.enabled = True
+
+    def emit(self, event):
+        for hook in self.hooks:
+            hook(event)
+
+    def stage(self, name):
+        """Context manager que suma el tiempo de una etapa."""
+        if not self.enabled:
+            return NULL_STAGE
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            timer = self.timers.setdefault(name, [0.0, 0])
+            timer[0] += elapsed
+            timer[1] += 1
+            self.emit({"event": "stage", "stage": name, "seconds": elapsed})
+
+    def timed(self, name):
+        """Decorador: mide cada llamada a la función como la etapa `name`."""
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with self._timed(name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def count(self, name, amount=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def unmapped(self, letters):
+        """Cuenta las letras sin glifo en el keymap, sin un aviso por cada una."""
+        for letter in letters:
+            self.unmapped_letters[letter] = self.unmapped_letters.get(letter, 0) + 1
+
+    def page(self, number, output=None):
+        """Registra una página emitida (número dentro de su salida)."""
+        self.count("pages")
+        self.emit({"event": "page", "output": output, "page": number})
+
+    def snapshot(self):
+        """Lo acumulado hasta ahora, como diccionario serializable."""
+        return {
+            "stages": {name: {"seconds": seconds, "calls": calls} for name, (seconds, calls) in self.timers.items()},
+            "counters": dict(self.counters),
+            "unmapped": dict(self.unmapped_letters),
+        }
+
+    def merge(self, snapshot):
+        """Suma lo acumulado en otro proceso (por ejemplo, un worker del pool)."""
+        for name, stage in snapshot["stages"].items():
+            timer = self.timers.setdefault(name, [0.0, 0])
+            timer[0] += stage["seconds"]
+            timer[1] += stage["calls"]
+        for name, amount in snapshot["counters"].items():
+            self.counters[name] = self.counters.get(name, 0) + amount
+        for letter, amount in snapshot["unmapped"].items():
+            self.unmapped_letters[letter] = self.unmapped_letters.get(letter, 0) + amount
+
+    def report(self):
+        """Escribe el resumen en el log según el modo: texto o una línea JSON."""
+        if self.mode == "json":
+            logger.info(json.dumps(self.snapshot(), ensure_ascii=False))
+        elif self.mode == "summary":
+            for name, (seconds, calls) in self.timers.items():
+                logger.info(f"{name:<10} {seconds * 1000:10.1f} ms  ({calls} llamadas)")
+            if self.counters:
+                logger.info(", ".join(f"{name}: {amount}" for name, amount in self.counters.items()))
+            if self.unmapped_letters:
+                letters = ", ".join(f"'{letter}' x{amount}" for letter, amount in sorted(self.unmapped_letters.items(), key=lambda item: -item[1]))
+                logger.info(f"Letras no encontradas en keymap: {letters}")
+
+
+# Instancia compartida por todo el proceso
+instrumentation = Instrumentation()
+
+
+def configure_logging(mode):
+    """Configura la salida del log para los CLIs cuando la instrumentación está encendida."""
+    instrumentation.configure(mode)
+    if mode != "off":
+        logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+
+def collect(mode, function, kwargs):
+    """Ejecuta un trabajo en un worker con la instrumentación del proceso principal y devuelve lo acumulado."""
+    instrumentation.configure(mode)
+    function(**kwargs)
+    return instrumentation.snapshot()
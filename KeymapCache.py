@@ -0,0 +1,90 @@
+# keymap_cache.py
+
+import os
+import pickle
+import hashlib
+from GlyphTable import GlyphTable, KeymapError, compile_keymap
+from Instrumentation import instrumentation
+
+# Versión del formato de la caché; se sube cuando cambia GlyphTable
+CACHE_VERSION = 2
+
+
+def cache_dir():
+    """Directorio de la caché de keymaps compilados."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "triangles-cypher")
+
+
+def cache_path(keymap_file, lines_map, size):
+    """Archivo de caché para un keymap, un LINES_MAP y un tamaño concretos."""
+    key = repr((CACHE_VERSION, os.path.abspath(keymap_file), sorted(lines_map.items()), size))
+    return os.path.join(cache_dir(), hashlib.sha256(key.encode("utf-8")).hexdigest()[:32] + ".pickle")
+
+
+def read_entry(path):
+    try:
+        with open(path, "rb") as file:
+            return pickle.load(file)
+    except Exception:
+        # Una caché ausente o corrupta sólo obliga a recompilar
+        return None
+
+
+def write_entry(path, entry):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as file:
+            pickle.dump(entry, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+    except OSError as e:
+        print(f"Advertencia: no se pudo guardar la caché del keymap: {e}")
+
+
+def compile_glyphs(load_keymap, lines_map, size):
+    """Carga, valida y compila el keymap; informa de los errores antes de propagarlos."""
+    try:
+        keymap, lines_map = compile_keymap(load_keymap(), lines_map)
+    except KeymapError as e:
+        print(e)
+        raise
+    return keymap, GlyphTable(keymap, lines_map, size)
+
+
+@instrumentation.timed("keymap")
+def load_compiled_keymap(keymap_file, lines_map, size, load_keymap):
+    """
+    Devuelve (keymap, GlyphTable) desde la caché en disco si el archivo no
+    cambió. Primero se compara mtime y tamaño; si difieren, el hash del
+    contenido. Si no hay caché válida se llama a `load_keymap`, se valida
+    y se compila; `lines_map` son los trazos por defecto.
+    """
+    path = cache_path(keymap_file, lines_map, size)
+    entry = read_entry(path)
+
+    try:
+        stat = os.stat(keymap_file)
+    except OSError:
+        # Que load_keymap informe del error como siempre
+        return compile_glyphs(load_keymap, lines_map, size)
+
+    if entry and entry["stat"] == (stat.st_mtime_ns, stat.st_size):
+        return entry["keymap"], entry["glyphs"]
+
+    with open(keymap_file, "rb") as file:
+        digest = hashlib.sha256(file.read()).hexdigest()
+
+    if entry and entry["digest"] == digest:
+        entry["stat"] = (stat.st_mtime_ns, stat.st_size)
+        write_entry(path, entry)
+        return entry["keymap"], entry["glyphs"]
+
+    keymap, glyphs = compile_glyphs(load_keymap, lines_map, size)
+    write_entry(path, {
+        "stat": (stat.st_mtime_ns, stat.st_size),
+        "digest": digest,
+        "keymap": keymap,
+        "glyphs": glyphs,
+    })
+    return keymap, glyphs
@@ -0,0 +1,103 @@
+# line_breaker.py
+
+# Formas de repartir las palabras en líneas que acepta layout_text
+LINE_BREAKING = ("greedy", "optimal")
+
+
+def split_long_words(counts, capacity):
+    """
+    Parte las palabras con más glifos que `capacity` en trozos de una
+    línea completa más un último trozo con el resto. Devuelve los glifos
+    de cada trozo, en orden.
+    """
+    pieces = []
+    for count in counts:
+        while count > capacity:
+            pieces.append(capacity)
+            count -= capacity
+        pieces.append(count)
+    return pieces
+
+
+def break_paragraph(counts, capacity, spacing=1):
+    """
+    Reparte las palabras de un párrafo (glifos de cada una) en líneas de
+    `capacity` columnas, al estilo de Knuth-Plass: primero usa el mínimo de
+    líneas posible (nunca más que el reparto voraz, así que tampoco más
+    páginas) y entre esos repartos elige el de menor suma de cuadrados del
+    espacio libre al final de cada línea, salvo la última.
+    `spacing` es el número de columnas entre palabras. Las palabras que no
+    caben en una línea se parten.
+    Devuelve (glifos, columnas, filas, número de filas) de cada trozo, con
+    las filas contadas desde el inicio del párrafo.
+    Como todos los glifos miden lo mismo, en una línea caben como mucho
+    `capacity` palabras con glifos: el costo es lineal en el número de palabras.
+    """
+    pieces = split_long_words(counts, capacity)
+
+    # Con `spacing` 0 las palabras sin glifos (sólo signos) no ocupan columnas
+    # y no acotarían la búsqueda: se reparten las demás y cada una de estas
+    # queda justo después de la anterior
+    if spacing == 0 and 0 in pieces:
+        wide = [index for index, piece in enumerate(pieces) if piece]
+        _, wide_columns, wide_rows, used = break_paragraph([pieces[index] for index in wide], capacity, spacing)
+        columns = [0] * len(pieces)
+        rows = [0] * len(pieces)
+        column = row = 0
+        next_wide = iter(zip(wide_columns, wide_rows))
+        for index, piece in enumerate(pieces):
+            if piece:
+                column, row = next(next_wide)
+            columns[index] = column
+            rows[index] = row
+            column += piece
+        return pieces, columns, rows, used
+
+    count = len(pieces)
+
+    # prefix[k]: columnas que ocupan los k primeros trozos, cada uno con su espacio
+    prefix = [0] * (count + 1)
+    for index, piece in enumerate(pieces):
+        prefix[index + 1] = prefix[index] + piece + spacing
+
+    if prefix[count] - spacing <= capacity:
+        return pieces, prefix[:count], [0] * count, 1
+
+    # Cada línea de más cuesta más que cualquier suma de espacios libres
+    line_cost = (capacity + 1) ** 2 * (count + 1)
+    best = [0] * (count + 1)
+    start = [0] * (count + 1)
+    for end in range(1, count + 1):
+        last = end == count
+        end_column = prefix[end] - spacing
+        best_cost = None
+        first = end - 1
+        while first >= 0:
+            free = capacity - (end_column - prefix[first])
+            if free < 0:
+                break
+            cost = best[first] + line_cost + (0 if last else free * free)
+            if best_cost is None or cost < best_cost:
+                best_cost = cost
+                best_first = first
+            first -= 1
+        best[end] = best_cost
+        start[end] = best_first
+
+    # Se recorren los cortes desde el final y se numeran las filas después
+    breaks = []
+    end = count
+    while end > 0:
+        breaks.append(end)
+        end = start[end]
+    breaks.reverse()
+
+    columns = [0] * count
+    rows = [0] * count
+    first = 0
+    for row, end in enumerate(breaks):
+        for index in range(first, end):
+            columns[index] = prefix[index] - prefix[first]
+            rows[index] = row
+        first = end
+    return pieces, columns, rows, len(breaks)
@@ -0,0 +1,103 @@
+# page_manifest.py
+
+import os
+import json
+import hashlib
+
+
+def page_filename(output_filename, number):
+    """Archivo de una página: la primera usa el nombre pedido, las demás `{base}_{n}{ext}`."""
+    base, extension = os.path.splitext(output_filename)
+    return output_filename if number == 1 else f"{base}_{number}{extension}"
+
+
+def manifest_path(output_filename):
+    """Archivo oculto, junto a la salida, con la huella de cada página."""
+    directory, name = os.path.split(output_filename)
+    return os.path.join(directory, f".{name}.pages.json")
+
+
+def page_cache(output_filename):
+    """
+    Base de los archivos de página de un PDF: cada página se guarda como PDF
+    propio en una carpeta oculta junto a la salida, con su manifiesto.
+    """
+    directory, name = os.path.split(output_filename)
+    return os.path.join(directory, f".{name}.pages", "page.pdf")
+
+
+def style_digest(*settings):
+    """Huella de todo lo que afecta al dibujo de cualquier página (glifos, escala, leyendas)."""
+    digest = hashlib.sha1()
+    for setting in settings:
+        digest.update(setting if isinstance(setting, bytes) else repr(setting).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def page_digest(style, glyph_ids, x, y):
+    """Huella de una página: qué glifos tiene, dónde y con qué estilo."""
+    digest = hashlib.sha1(style.encode("ascii"))
+    for values in (glyph_ids, x, y):
+        digest.update(values.tobytes())
+    return digest.hexdigest()
+
+
+def load_manifest(output_filename):
+    """Devuelve la lista de páginas de la salida anterior ([] si no hay)."""
+    try:
+        with open(manifest_path(output_filename), "r") as file:
+            return json.load(file)["pages"]
+    except (OSError, ValueError, KeyError):
+        return []
+
+
+def save_manifest(output_filename, pages):
+    path = manifest_path(output_filename)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "w") as file:
+            json.dump({"pages": pages}, file)
+        os.replace(temporary, path)
+    except OSError as e:
+        print(f"Advertencia: no se pudo guardar el manifiesto de páginas: {e}")
+
+
+def incremental_pages(output_filename, pages, style, page_lines=None, force=False):
+    """
+    Compara las páginas nuevas (glyph_ids, x, y) con la salida anterior y
+    devuelve (número, página) sólo de las que cambiaron o cuyo archivo falta.
+    Al terminar de recorrerlas guarda el manifiesto nuevo y borra los
+    archivos de páginas que ya no existen.
+    `page_lines` es, por página, el rango de líneas de entrada (primera, última).
+    """
+    previous = [] if force else load_manifest(output_filename)
+    entries = []
+    changed = []
+
+    for number, (glyph_ids, x, y) in enumerate(pages, start=1):
+        digest = page_digest(style, glyph_ids, x, y)
+        lines = list(page_lines[number - 1]) if page_lines is not None else None
+        entries.append({"digest": digest, "lines": lines})
+
+        unchanged = number <= len(previous) and previous[number - 1]["digest"] == digest
+        if unchanged and os.path.exists(page_filename(output_filename, number)):
+            continue
+
+        changed.append(number)
+        yield number, (glyph_ids, x, y)
+
+    for number in range(len(entries) + 1, len(previous) + 1):
+        try:
+            os.remove(page_filename(output_filename, number))
+        except OSError:
+            pass
+
+    save_manifest(output_filename, entries)
+
+    if len(changed) < len(entries):
+        described = [
+            f"{number} (líneas {entries[number - 1]['lines'][0] + 1}-{entries[number - 1]['lines'][1] + 1})"
+            if entries[number - 1]["lines"] else str(number)
+            for number in changed
+        ]
+        print(f"Páginas redibujadas: {', '.join(described) or 'ninguna'} de {len(entries)}")
@@ -0,0 +1,101 @@
+# pdf_merge.py
+
+import re
+
+# Referencia indirecta "n g R" en un diccionario o arreglo PDF
+REFERENCE = re.compile(rb"(?<![\d.])(\d+) (\d+) R\b")
+# Inicio de los datos de un objeto stream, después de su diccionario
+STREAM = re.compile(rb"\bstream\r?\n")
+
+
+def reference(body, key):
+    """Número del objeto al que apunta `key` (p. ej. b"/Root") en un diccionario."""
+    match = re.search(re.escape(key) + rb"\s+(\d+) \d+ R", body)
+    if match is None:
+        raise ValueError(f"PDF no soportado: falta {key.decode('ascii')}.")
+    return int(match.group(1))
+
+
+def read_objects(data):
+    """
+    Lee un PDF con una sola tabla xref clásica, como los que escribe
+    matplotlib, y devuelve ({número: cuerpo}, trailer). El cuerpo va sin
+    "n 0 obj" ni "endobj"; cada objeto termina donde empieza el siguiente,
+    así que no hace falta recorrer los streams.
+    """
+    xref_offset = int(data[data.rindex(b"startxref") + len(b"startxref"):].split()[0])
+    table, trailer = data[xref_offset:].split(b"trailer", 1)
+    trailer = trailer.split(b"startxref", 1)[0]
+    if b"/Prev" in trailer or not table.startswith(b"xref"):
+        raise ValueError("PDF no soportado: sólo se admite una tabla xref clásica.")
+
+    tokens = table.split()[1:]
+    offsets = {}
+    while tokens:
+        first, count = int(tokens[0]), int(tokens[1])
+        entries, tokens = tokens[2:2 + 3 * count], tokens[2 + 3 * count:]
+        for index in range(count):
+            offset, flag = entries[3 * index], entries[3 * index + 2]
+            if flag == b"n":
+                offsets[first + index] = int(offset)
+
+    ends = sorted(offsets.values()) + [xref_offset]
+    following = dict(zip(ends, ends[1:]))
+    bodies = {}
+    for number, offset in offsets.items():
+        chunk = data[offset:following[offset]]
+        header = re.match(rb"\s*(\d+) \d+ obj\s*", chunk)
+        if header is None or int(header.group(1)) != number:
+            raise ValueError(f"PDF no soportado: el objeto {number} no está donde indica la xref.")
+        bodies[number] = chunk[header.end():chunk.rindex(b"endobj")].rstrip()
+    return bodies, trailer
+
+
+def renumber(body, mapping):
+    """Cambia las referencias del cuerpo de un objeto; los datos de un stream no se tocan."""
+    match = STREAM.search(body) if body.startswith(b"<<") else None
+    head, tail = (body[:match.start()], body[match.start():]) if match else (body, b"")
+    return REFERENCE.sub(lambda m: b"%d 0 R" % mapping[int(m.group(1))], head) + tail
+
+
+def merge_pdf_pages(documents):
+    """
+    Une varios PDF (bytes) en uno con todas sus páginas, en orden. Cada
+    documento conserva sus recursos (fuentes, estados gráficos); sólo se
+    renumeran sus objetos y sus páginas pasan a colgar de un único /Pages.
+    Se omiten el catálogo, el árbol de páginas y la información de cada uno.
+    """
+    objects = [None, None]  # 1: catálogo, 2: árbol de páginas
+    kids = []
+    for data in documents:
+        bodies, trailer = read_objects(data)
+        root = reference(trailer, b"/Root")
+        pages = reference(bodies[root], b"/Pages")
+        kids_array = bodies[pages].split(b"/Kids", 1)[1].split(b"]", 1)[0]
+        page_numbers = [int(match.group(1)) for match in REFERENCE.finditer(kids_array)]
+        skipped = {root, pages}
+        if b"/Info" in trailer:
+            skipped.add(reference(trailer, b"/Info"))
+
+        kept = [number for number in sorted(bodies) if number not in skipped]
+        mapping = {number: len(objects) + 1 + index for index, number in enumerate(kept)}
+        mapping[pages] = 2
+        try:
+            objects.extend(renumber(bodies[number], mapping) for number in kept)
+        except KeyError as e:
+            raise ValueError(f"PDF no soportado: referencia al objeto {e} omitido.")
+        kids.extend(mapping[number] for number in page_numbers)
+
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = b"<< /Type /Pages /Kids [ %s ] /Count %d >>" % (b" ".join(b"%d 0 R" % kid for kid in kids), len(kids))
+
+    output = bytearray(b"%PDF-1.4\n%\xac\xdc \xab\xba\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref_offset = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    return bytes(output)
@@ -0,0 +1,184 @@
+# render_cache.py
+
+import os
+import json
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Versión del formato de las entradas; se sube cuando cambia el dibujo.
+# 2: leyendas SVG escapadas. 3: abecedario con todos los caracteres del
+# keymap y leyendas PNG con dígitos y signos.
+CACHE_VERSION = 3
+
+
+def render_key(encoder, text, mode, file_format, letter_spacing, line_spacing, page=1):
+    """
+    Clave de una salida: hash del texto normalizado, del contenido del
+    keymap, de la geometría del encoder y de los parámetros de la salida.
+    Textos que se normalizan igual (acentos, mayúsculas) comparten salida.
+    """
+    if mode == 'abc':
+        # El abecedario no depende del texto
+        text = ""
+    normalized = "\n".join(line.translate(encoder.glyphs.translation) for line in text.splitlines())
+
+    geometry = (
+        type(encoder).__module__,
+        encoder.size,
+        encoder.SCREEN_WIDTH,
+        encoder.SCREEN_HEIGHT,
+        encoder.MARGIN_LEFT,
+        encoder.MARGIN_RIGHT,
+        encoder.INITIAL_BASELINE,
+        encoder.MARGIN_BOTTOM,
+        getattr(encoder, "PIXELS_PER_UNIT", None),
+        sorted(encoder.glyphs.lines_map.items()),
+    )
+    parameters = (mode, file_format, letter_spacing, line_spacing, page)
+
+    digest = hashlib.sha256()
+    digest.update(repr((CACHE_VERSION, geometry, parameters)).encode("utf-8"))
+    digest.update(json.dumps(encoder.keymap, sort_keys=True).encode("utf-8"))
+    digest.update(normalized.encode("utf-8", "surrogatepass"))
+    return digest.hexdigest()
+
+
+class RenderCache:
+    """
+    Caché LRU de salidas ya dibujadas (bytes y cabeceras), en memoria y
+    opcionalmente en disco, cada una acotada por tamaño total en bytes.
+    Lleva contadores de aciertos y fallos.
+    """
+
+    def __init__(self, max_bytes=64 << 20, directory=None, max_disk_bytes=512 << 20):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+        self.disk_size = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.disk_size = sum(size for _, size, _ in self.disk_entries())
+
+    def entry_path(self, key):
+        return os.path.join(self.directory, key + ".pickle")
+
+    def disk_entries(self):
+        """Devuelve (mtime, tamaño, ruta) de las entradas guardadas en disco."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".pickle"):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, path))
+        return entries
+
+    def get(self, key):
+        """Devuelve (contenido, cabeceras) si la salida está en caché, o None."""
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+
+        value = self.read_disk(key)
+        with self.lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self.store(key, value)
+            return value
+
+    def put(self, key, value):
+        """Guarda (contenido, cabeceras) en memoria y, si hay directorio, en disco."""
+        with self.lock:
+            self.store(key, value)
+        self.write_disk(key, value)
+
+    def store(self, key, value):
+        # Se llama con el lock tomado
+        size = len(value[0])
+        if size > self.max_bytes:
+            return
+        if key in self.entries:
+            self.size -= len(self.entries.pop(key)[0])
+        self.entries[key] = value
+        self.size += size
+        while self.size > self.max_bytes:
+            _, (content, _) = self.entries.popitem(last=False)
+            self.size -= len(content)
+            self.evictions += 1
+
+    def read_disk(self, key):
+        if not self.directory:
+            return None
+        path = self.entry_path(key)
+        try:
+            with open(path, "rb") as file:
+                value = pickle.load(file)
+            # La fecha de modificación hace de orden LRU en disco
+            os.utime(path)
+            return value
+        except Exception:
+            # Una entrada ausente o corrupta sólo obliga a dibujar de nuevo
+            return None
+
+    def write_disk(self, key, value):
+        if not self.directory or len(value[0]) > self.max_disk_bytes:
+            return
+        path = self.entry_path(key)
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temporary, "wb") as file:
+                pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+            written = os.path.getsize(temporary)
+            os.replace(temporary, path)
+        except OSError as e:
+            print(f"Advertencia: no se pudo guardar la salida en caché: {e}")
+            return
+
+        with self.lock:
+            self.disk_size += written
+            if self.disk_size > self.max_disk_bytes:
+                self.evict_disk()
+
+    def evict_disk(self):
+        """Borra las entradas de disco usadas hace más tiempo hasta caber en el límite."""
+        entries = sorted(self.disk_entries())
+        self.disk_size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self.disk_size <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.disk_size -= size
+            self.evictions += 1
+
+    def stats(self):
+        """Contadores de la caché."""
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "disk_bytes": self.disk_size,
+            }
@@ -0,0 +1,315 @@
+# symbolic_decoder.py
+
+import json
+import numpy as np
+from GlyphTable import DEFAULT_LINES_MAP, KeymapError, compile_keymap
+
+class SymbolicDecoder:
+    # Mismos trazos por defecto que SymbolicEncoder: cada trazo es un bit del código del glifo
+    LINES_MAP = DEFAULT_LINES_MAP
+
+    UNKNOWN_LETTER = "?"
+
+    def __init__(self, keymap_file, size, screen_width=1200, screen_height=800, margin_left=10, initial_baseline=750):
+        self.keymap_file = keymap_file
+        self.size = size
+        self.SCREEN_WIDTH = screen_width
+        self.SCREEN_HEIGHT = screen_height
+        self.MARGIN_LEFT = margin_left
+        self.INITIAL_BASELINE = initial_baseline
+
+        try:
+            self.keymap, self.lines_map = compile_keymap(self.load_keymap(), self.LINES_MAP)
+            self.check_midpoints()
+        except KeymapError as e:
+            print(e)
+            raise
+        self.stroke_names = list(self.lines_map)
+        self.build_lookup()
+
+    def load_keymap(self):
+        """Carga el archivo keymap_file y lo devuelve como un diccionario."""
+        try:
+            with open(self.keymap_file, "r") as file:
+                keymap = json.load(file)
+            print("Keymap cargado correctamente.")
+            return keymap
+        except FileNotFoundError:
+            print(f"El archivo {self.keymap_file} no se encuentra.")
+            raise
+        except json.JSONDecodeError:
+            print(f"Error al decodificar {self.keymap_file}.")
+            raise
+
+    def check_midpoints(self):
+        """
+        Cada trazo se reconoce por su punto medio: dos trazos con el mismo
+        punto medio (por ejemplo, dos diagonales que se cruzan) se dibujan
+        bien, pero no se pueden distinguir al decodificar.
+        """
+        midpoints = {}
+        for name, (x1, y1, x2, y2) in self.lines_map.items():
+            midpoints.setdefault(((x1 + x2) / 2, (y1 + y2) / 2), []).append(name)
+        errors = [f"los trazos {', '.join(names)} tienen el mismo punto medio" for names in midpoints.values() if len(names) > 1]
+        if errors:
+            raise KeymapError("Keymap no decodificable:\n  " + "\n  ".join(errors))
+
+    def stroke_mask(self, line_keys):
+        """
+        Devuelve el código de bits de un conjunto de trazos (ya validados).
+        """
+        mask = 0
+        for line_key in line_keys:
+            mask |= 1 << self.stroke_names.index(line_key)
+        return mask
+
+    def build_lookup(self):
+        """
+        Invierte el keymap en una tabla código -> letra con una entrada por
+        cada combinación de trazos, y la geometría esperada de cada trazo.
+        compile_keymap ya garantiza que no hay dos letras con los mismos trazos.
+        """
+        self.letters = np.full(1 << len(self.stroke_names), self.UNKNOWN_LETTER, dtype="<U1")
+        # El keymap puede definir el mismo carácter que UNKNOWN_LETTER
+        self.defined = np.zeros(len(self.letters), dtype=bool)
+        for letter_char, line_keys in self.keymap.items():
+            mask = self.stroke_mask(line_keys)
+            self.letters[mask] = letter_char
+            self.defined[mask] = True
+
+        # Punto medio de cada trazo relativo a (x, baseline_y), ya escalado
+        scale = self.size / 50
+        lines = np.array([self.lines_map[name] for name in self.stroke_names], dtype=float) * scale
+        self.midpoints = np.column_stack((
+            (lines[:, 0] + lines[:, 2]) / 2,
+            -(lines[:, 1] + lines[:, 3]) / 2,
+        ))
+        self.anchor = self.midpoints.mean(axis=0)
+
+        # Un punto medio más lejos que esto de cualquier trazo conocido no es un trazo
+        distances = np.linalg.norm(self.midpoints[:, None] - self.midpoints[None], axis=-1)
+        self.tolerance = distances[distances > 0].min() / 2
+
+        # Tabla de trazos por punto medio cuantizado dentro de la celda: cada
+        # casilla de lado `quantum` guarda el bit del trazo a menos de
+        # `tolerance` de su centro, o 0. El borde queda en 0 y los índices
+        # fuera de la tabla se recortan hacia él.
+        self.quantum = self.tolerance / 4
+        self.table_origin = self.midpoints.min(axis=0) - self.tolerance - self.quantum
+        extent = self.midpoints.max(axis=0) + self.tolerance - self.table_origin
+        size_x, size_y = np.ceil(extent / self.quantum).astype(np.intp) + 2
+        centers_x = self.table_origin[0] + (np.arange(size_x) + 0.5) * self.quantum
+        centers_y = self.table_origin[1] + (np.arange(size_y) + 0.5) * self.quantum
+        dx = centers_x[None, :, None] - self.midpoints[:, 0]
+        dy = centers_y[:, None, None] - self.midpoints[:, 1]
+        distances = dx * dx + dy * dy
+        nearest = distances.argmin(axis=-1)
+        bits = np.left_shift(1, nearest).astype(np.min_scalar_type(len(self.letters) - 1))
+        self.stroke_table = np.where(distances.min(axis=-1) <= self.tolerance ** 2, bits, 0)
+        self.stroke_table[[0, -1], :] = 0
+        self.stroke_table[:, [0, -1]] = 0
+
+        # Punto de código de cada letra, para armar el texto sin pasar por cadenas
+        self.codepoints = self.letters.view(np.uint32)
+
+    def decode_glyphs(self, segments, letter_spacing=0.4, line_spacing=0.6):
+        """
+        Agrupa los segmentos (N, 4) de una página en glifos según la rejilla
+        de letras y devuelve (filas, columnas, códigos) de cada glifo.
+        Para la vista con solución, `line_spacing` debe incluir el 0.3 extra.
+        """
+        segments = np.asarray(segments, dtype=float).reshape(-1, 4)
+        letter_box_width = self.size * letter_spacing
+        line_height = self.size * line_spacing
+
+        # Punto medio de cada segmento relativo a la primera celda
+        middle_x = segments[:, 0] + segments[:, 2]
+        middle_x *= 0.5
+        middle_x -= self.MARGIN_LEFT
+        middle_y = segments[:, 1] + segments[:, 3]
+        middle_y *= 0.5
+        middle_y -= self.INITIAL_BASELINE
+        columns = np.rint((middle_x - self.anchor[0]) / letter_box_width).astype(np.intp)
+        rows = np.rint((self.anchor[1] - middle_y) / line_height).astype(np.intp)
+
+        # Cada trazo se busca en la tabla con su punto medio cuantizado dentro
+        # de la celda; truncar en vez de redondear hacia abajo sólo cae en el borde vacío
+        middle_x -= columns * letter_box_width
+        middle_y += rows * line_height
+        table_y, table_x = self.stroke_table.shape
+        middle_x -= self.table_origin[0]
+        middle_x *= 1 / self.quantum
+        middle_y -= self.table_origin[1]
+        middle_y *= 1 / self.quantum
+        index_x = np.clip(middle_x.astype(np.intp), 0, table_x - 1)
+        index_y = np.clip(middle_y.astype(np.intp), 0, table_y - 1)
+        bits = self.stroke_table[index_y, index_x]
+        known = bits != 0
+        if not known.all():
+            print(f"Advertencia: {int((~known).sum())} segmentos no corresponden a ningún trazo")
+            rows, columns, bits = rows[known], columns[known], bits[known]
+        if len(bits) == 0:
+            return rows, columns, bits.astype(np.intp)
+
+        # Los trazos de un mismo glifo quedan contiguos y se combinan con un OR;
+        # los segmentos que vienen del layout ya están en orden y no se reordenan
+        first_row, first_column = rows.min(), columns.min()
+        cells = (rows - first_row) * (columns.max() - first_column + 1) + (columns - first_column)
+        if np.any(cells[1:] < cells[:-1]):
+            order = np.argsort(cells, kind="stable")
+            cells, bits = cells[order], bits[order]
+        starts = np.flatnonzero(np.r_[True, cells[1:] != cells[:-1]])
+        codes = np.bitwise_or.reduceat(bits, starts).astype(np.intp)
+        rows, columns = np.divmod(cells[starts], columns.max() - first_column + 1)
+        return rows + first_row, columns + first_column, codes
+
+    def letters_to_text(self, rows, columns, codes):
+        """
+        Traduce los códigos de cada glifo a letras y arma el texto, una línea
+        por fila. Las celdas vacías (código 0) se leen como espacios.
+        """
+        unknown = ~self.defined[codes] & (codes != 0)
+        for row, column, code in zip(rows[unknown], columns[unknown], codes[unknown]):
+            print(f"Advertencia: trazos sin letra en fila {row}, columna {column} (código {code:0{len(self.stroke_names)}b})")
+
+        first_row = rows.min()
+        first_column = min(columns.min(), 0)
+        row_count = int(rows.max() - first_row) + 1
+        visible = codes != 0
+        rows = rows[visible] - first_row
+        columns = columns[visible] - first_column
+
+        # Cada fila ocupa hasta su última letra más un salto de línea; el
+        # texto se arma como puntos de código y se decodifica de una vez
+        widths = np.zeros(row_count, dtype=np.intp)
+        np.maximum.at(widths, rows, columns + 1)
+        starts = np.cumsum(widths + 1) - (widths + 1)
+        text = np.full(int(starts[-1] + widths[-1] + 1), ord(" "), dtype=np.uint32)
+        text[starts + widths] = ord("\n")
+        text[starts[rows] + columns] = self.codepoints[codes[visible]]
+        return text.tobytes().decode("utf-32-le").split("\n")[:-1]
+
+    def decode(self, segments, letter_spacing=0.4, line_spacing=0.6):
+        """
+        Decodifica los segmentos de una página y devuelve el texto, una línea
+        por fila. Las columnas vacías entre glifos se leen como espacios.
+        """
+        rows, columns, codes = self.decode_glyphs(segments, letter_spacing, line_spacing)
+        if len(codes) == 0:
+            return []
+        return self.letters_to_text(rows, columns, codes)
+
+    def decode_layout(self, layout, letter_spacing=0.4):
+        """
+        Decodifica directamente un TextLayout (también uno abierto con
+        TextLayout.load) sin dibujarlo: los ids de glifo siguen el orden
+        alfabético del keymap, igual que en GlyphTable.
+        """
+        if len(layout) == 0:
+            return []
+        glyph_codes = np.array([self.stroke_mask(self.keymap[char]) for char in sorted(self.keymap)], dtype=np.intp)
+        columns = np.rint((layout.x - self.MARGIN_LEFT) / (self.size * letter_spacing)).astype(np.intp)
+        return self.letters_to_text(np.asarray(layout.rows, dtype=np.intp), columns, glyph_codes[layout.glyph_ids])
+
+    def read_image(self, image_file):
+        """
+        Lee una imagen (PNG) y devuelve una máscara booleana con la tinta.
+        """
+        import matplotlib.pyplot as plt
+
+        try:
+            image = plt.imread(image_file)
+        except FileNotFoundError:
+            print(f"El archivo {image_file} no se encuentra.")
+            raise
+
+        if image.dtype.kind != "f":
+            image = image.astype(np.float32) / np.iinfo(image.dtype).max
+        if image.ndim == 3:
+            gray = image[..., 0] + image[..., 1]
+            gray += image[..., 2]
+            gray /= 3
+            if image.shape[2] == 4:
+                # La transparencia se compone sobre blanco
+                alpha = image[..., 3]
+                gray *= alpha
+                gray += 1 - alpha
+            image = gray
+        return image < 0.5
+
+    def save_output_scale(self, dpi=300, figsize=(12, 8)):
+        """
+        Píxeles por unidad (x, y) de las imágenes que guarda SymbolicEncoder.save_output.
+        """
+        import matplotlib
+
+        subplot = matplotlib.rcParams
+        width = figsize[0] * (subplot["figure.subplot.right"] - subplot["figure.subplot.left"]) * dpi
+        height = figsize[1] * (subplot["figure.subplot.top"] - subplot["figure.subplot.bottom"]) * dpi
+        return width / self.SCREEN_WIDTH, height / self.SCREEN_HEIGHT
+
+    def decode_image(self, image, letter_spacing=0.4, line_spacing=0.6, scale=None, samples=3, radius=None):
+        """
+        Decodifica una imagen (ruta o máscara de tinta). La rejilla se ubica
+        con la esquina superior izquierda de la tinta y la geometría conocida;
+        `scale` son los píxeles por unidad (x, y), por defecto los de save_output;
+        `radius` es cuántos píxeles se puede corregir el origen.
+        En cada celda se muestrean todos los trazos del keymap a la vez.
+        """
+        ink = self.read_image(image) if isinstance(image, str) else np.asarray(image, dtype=bool)
+        if scale is None:
+            scale = self.save_output_scale()
+        scale_x, scale_y = np.broadcast_to(np.asarray(scale, dtype=float), 2)
+
+        ink_rows = np.flatnonzero(ink.any(axis=1))
+        ink_columns = np.flatnonzero(ink.any(axis=0))
+        if len(ink_rows) == 0:
+            return []
+
+        letter_box_width = self.size * letter_spacing * scale_x
+        line_height = self.size * line_spacing * scale_y
+        if radius is None:
+            radius = int(letter_box_width // 6)
+
+        # Trazos en píxeles relativos a (x, baseline_y), con y hacia abajo como en la imagen
+        lines = np.array([self.lines_map[name] for name in self.stroke_names], dtype=float) * (self.size / 50)
+        lines[:, 0::2] *= scale_x
+        lines[:, 1::2] *= scale_y
+
+        # La tinta empieza en el trazo más a la izquierda y más arriba de la primera celda
+        origin_x = ink_columns[0] - lines[:, 0::2].min()
+        origin_y = ink_rows[0] - lines[:, 1::2].min()
+        column_count = int((ink_columns[-1] - origin_x) // letter_box_width) + 1
+        row_count = int((ink_rows[-1] - origin_y) // line_height) + 1
+
+        # Puntos de muestreo a lo largo de cada trazo, lejos de los vértices compartidos
+        t = np.linspace(0.3, 0.7, samples)
+        stroke_x = lines[:, 0, None] + (lines[:, 2] - lines[:, 0])[:, None] * t
+        stroke_y = lines[:, 1, None] + (lines[:, 3] - lines[:, 1])[:, None] * t
+
+        cell_x = origin_x + np.arange(column_count) * letter_box_width
+        cell_y = origin_y + np.arange(row_count) * line_height
+        x = np.rint(cell_x[None, :, None, None] + stroke_x[None, None]).astype(np.intp)
+        y = np.rint(cell_y[:, None, None, None] + stroke_y[None, None]).astype(np.intp)
+        x, y = (np.ascontiguousarray(a) for a in np.broadcast_arrays(x, y))
+
+        # El grosor del trazo desplaza el borde de la tinta; se ajusta el
+        # origen buscando el desplazamiento que cae sobre más tinta
+        padded = np.pad(ink, radius + 1)
+        x = np.clip(x + radius + 1, radius, padded.shape[1] - radius - 1)
+        y = np.clip(y + radius + 1, radius, padded.shape[0] - radius - 1)
+        shifts = np.arange(-radius, radius + 1)
+        scores = [[padded[y + shift_y, x + shift_x].sum() for shift_x in shifts] for shift_y in shifts]
+        best_y, best_x = np.unravel_index(np.argmax(scores), (len(shifts), len(shifts)))
+        hits = padded[y + shifts[best_y], x + shifts[best_x]]
+
+        # Un trazo está presente si la mayoría de sus muestras tiene tinta
+        present = hits.mean(axis=-1) > 0.5
+        codes = (present << np.arange(len(self.stroke_names))).sum(axis=-1)
+
+        rows, columns = np.indices(codes.shape)
+        text = self.letters_to_text(rows.ravel(), columns.ravel(), codes.ravel())
+        # La rejilla puede terminar en filas sin glifos
+        while text and not text[-1]:
+            text.pop()
+        return text
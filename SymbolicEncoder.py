@@ -1,22 +1,26 @@
 # symbolic_encoder.py
 
+import os
 import json
-import unicodedata
-import matplotlib.pyplot as plt
+import numpy as np
+from GlyphTable import DEFAULT_LINES_MAP
+from KeymapCache import load_compiled_keymap
+from TextLayout import TextLayout, wrap_text, rows_in_page, line_capacity, glyph_sheet
+from InputReader import read_lines
+from Instrumentation import instrumentation
+from PageManifest import page_filename, page_cache, style_digest, incremental_pages
+from PdfMerge import merge_pdf_pages
 
 class SymbolicEncoder:
-    # Definición de LINES_MAP base
-    LINES_MAP = {
-        "bottom_left":    [10, 30, 20, 15],
-        "bottom_right":   [30, 30, 20, 15],
-        "center":         [10, 30, 30, 30],
-        "top_left":       [10, 30, 20, 45],
-        "top_right":      [30, 30, 20, 45],
-    }
-
-    def __init__(self, keymap_file, size, screen_width=1200, screen_height=800, margin_left=10, margin_right=10, initial_baseline=750):
+    # Trazos por defecto; el archivo keymap puede añadir o redefinir trazos
+    LINES_MAP = DEFAULT_LINES_MAP
+
+    def __init__(self, keymap_file, size, screen_width=1200, screen_height=800, margin_left=10, margin_right=10, initial_baseline=750, margin_bottom=10):
         self.fig = None
         self.ax = None
+        self.pages = None
+        self.caption_position = None
+        self.page_lines = None
 
         self.keymap_file = keymap_file
         self.size = size
@@ -25,15 +29,15 @@ class SymbolicEncoder:
         self.MARGIN_LEFT = margin_left
         self.MARGIN_RIGHT = margin_right
         self.INITIAL_BASELINE = initial_baseline
+        self.MARGIN_BOTTOM = margin_bottom
 
-        self.keymap = self.load_keymap()
+        self.keymap, self.glyphs = load_compiled_keymap(self.keymap_file, self.LINES_MAP, self.size, self.load_keymap)
 
-    @staticmethod
-    def remove_accent(text):
-        return ''.join(
-            c for c in unicodedata.normalize('NFKD', text)
-            if not unicodedata.combining(c)
-        )
+    def __getstate__(self):
+        # Las figuras no se envían a los procesos del pool; sólo la tabla de glifos y la configuración
+        state = self.__dict__.copy()
+        state.update(fig=None, ax=None, pages=None)
+        return state
 
     def load_keymap(self):
         """Carga el archivo keymap_file y lo devuelve como un diccionario."""
@@ -50,128 +54,111 @@ class SymbolicEncoder:
             raise
 
     def read_file_content(self, input_file):
-        """Lee el contenido de un archivo de texto y lo devuelve como una lista de líneas."""
-        try:
-            with open(input_file, "r") as file:
-                content = file.readlines()
-            print("Contenido leído:", content)
-            return content
-        except FileNotFoundError:
-            print(f"El archivo {input_file} no se encuentra.")
-            raise
-        except Exception as e:
-            print(f"Error al leer el archivo {input_file}: {e}")
-            raise
+        """Devuelve un generador con las líneas del archivo de texto."""
+        return read_lines(input_file)
     
-    def draw_letter(self, ax, letter_config, position, size, show_letters=False, letter_position='below', dotted_guidelines=False, letter_char=None):
+    def draw_caption(self, ax, letter_char, position, size, letter_position='below'):
         """
-        Dibuja una letra en la posición (x, baseline_y), con el tamaño especificado.
+        Dibuja la letra en claro debajo o dentro del símbolo.
         """
         x_offset, baseline_y = position
-        scale = size / 50  # Escala base
-
-        for line_key in letter_config:
-            if line_key and line_key in self.LINES_MAP:
-                x1, y1, x2, y2 = self.LINES_MAP[line_key]
-
-                x1 = x_offset + x1 * scale
-                x2 = x_offset + x2 * scale
-                y1 = baseline_y - (y1 * scale)
-                y2 = baseline_y - (y2 * scale)
-
-                #linestyle = (0, (3, 3)) if dotted_guidelines else 'solid'
-
-                #ax.plot([x1, x2], [y1, y2], color='black', linewidth=2, linestyle=linestyle)
-                ax.plot([x1, x2], [y1, y2], color='black', linewidth=2)
-            else:
-                print(f"Advertencia: línea '{line_key}' no existe en LINES_MAP")
-
-        if show_letters and letter_char:
-            if letter_position == 'below':
-                ax.text(
-                    x_offset + (size * 0.4),
-                    baseline_y - (size * 1.2),
-                    letter_char.upper(),
-                    fontsize=size * 0.2,
-                    ha='center'
-                )
-            elif letter_position == 'inside':
-                ax.text(
-                    x_offset + (size * 0.2),
-                    baseline_y - (size * 0.5),
-                    letter_char.upper(),
-                    fontsize=size * 0.4,
-                    ha='center'
-                )
-
-    def check_fit(self, word, x_pos, letter_box_spacing):
-        """
-        Verifica si la palabra cabe en la línea actual.
-        Retorna True si cabe, False si no.
-        """
-        word_width = len(word) * letter_box_spacing
-        return (x_pos + word_width) <= (self.SCREEN_WIDTH - self.MARGIN_RIGHT)
+        if letter_position == 'below':
+            ax.text(
+                x_offset + (size * 0.4),
+                baseline_y - (size * 1.2),
+                letter_char.upper(),
+                fontsize=size * 0.2,
+                ha='center'
+            )
+        elif letter_position == 'inside':
+            ax.text(
+                x_offset + (size * 0.2),
+                baseline_y - (size * 0.5),
+                letter_char.upper(),
+                fontsize=size * 0.4,
+                ha='center'
+            )
+
+    def draw_segments(self, ax, segments):
+        """
+        Dibuja todos los segmentos (N, 4) como una única LineCollection.
+        """
+        from matplotlib.collections import LineCollection
+
+        if len(segments) == 0:
+            return
+        collection = LineCollection(
+            np.asarray(segments, dtype=float).reshape(-1, 2, 2),
+            colors='black',
+            linewidths=2,
+            capstyle='projecting'  # Igual que ax.plot
+        )
+        ax.add_collection(collection, autolim=False)
+
+    def layout_text(self, input_content, letter_spacing=0.4, trim_words=False, line_breaking='greedy'):
+        """
+        Reparte el texto en líneas una sola vez (ver TextLayout.wrap_text).
+        El TextLayout resultante puede pasarse a generate_text_encoded y
+        generate_text_solution; `line_breaking` es 'greedy' u 'optimal'.
+        """
+        return wrap_text(self.glyphs, input_content, self.size * letter_spacing, self.MARGIN_LEFT, self.SCREEN_WIDTH - self.MARGIN_RIGHT, trim_words, line_breaking)
+
+    def new_page(self):
+        """
+        Crea una figura vacía con los límites del canvas.
+        """
+        import matplotlib.pyplot as plt
+
+        self.fig, self.ax = plt.subplots(figsize=(12, 8))
+        self.ax.set_xlim(0, self.SCREEN_WIDTH)
+        self.ax.set_ylim(0, self.SCREEN_HEIGHT)
+        self.ax.axis('off')
+        return self.fig
 
     def draw_text(self, input_content, letter_spacing=0.4, line_spacing=0.6, show_letters=False, letter_position='below', dotted_guidelines=False, trim_words=False):
         """
-        Dibuja el texto completo en el canvas.
+        Reparte el texto completo en páginas (glyph_ids, x, baseline_y) a medida
+        que se recorre; cada figura se dibuja con page_figure al guardarla.
+        `input_content` puede ser un TextLayout ya calculado con layout_text.
         """
-        letter_box_width = self.size * letter_spacing
         line_height = self.size * line_spacing
 
         if show_letters and letter_position == 'below':
             # Añadimos espacio extra si las letras van abajo
             line_height += self.size * 0.3
 
-        baseline_y = self.INITIAL_BASELINE
-        x_pos = self.MARGIN_LEFT
-
-        for line in input_content:
-            text_line = line.strip('\n')
-            text_line = self.remove_accent(text_line)
-
-            if not text_line:
-                baseline_y -= line_height
-                x_pos = self.MARGIN_LEFT
-                continue
-
-            words = text_line.split(" ")
-            for word in words:
-                word_fits = self.check_fit(word, x_pos, letter_box_width)
-                if not word_fits:
-                    baseline_y -= line_height
-                    x_pos = self.MARGIN_LEFT
-
-                for letter in word:
-                    if letter.lower() in self.keymap:
-                        self.draw_letter(
-                            self.ax,
-                            self.keymap[letter.lower()],
-                            (x_pos, baseline_y),
-                            self.size,
-                            show_letters=show_letters,
-                            letter_position=letter_position,
-                            dotted_guidelines=dotted_guidelines,
-                            letter_char=letter
-                        )
-                        x_pos += letter_box_width
-                        
-                    else:
-                        print(f"Letra no encontrada en keymap: '{letter}'")
-
-                if not trim_words: 
-                    x_pos += letter_box_width
-
-            baseline_y -= line_height
-            x_pos = self.MARGIN_LEFT
+        # El símbolo cuelga casi `size` bajo la línea base, y la letra un poco más
+        descent = self.size * (1.2 if show_letters and letter_position == 'below' else 0.9)
+        rows_per_page = rows_in_page(self.INITIAL_BASELINE - descent - self.MARGIN_BOTTOM, line_height)
+
+        layout = input_content
+        if not isinstance(layout, TextLayout):
+            layout = self.layout_text(input_content, letter_spacing, trim_words)
+
+        self.caption_position = letter_position if show_letters else None
+        self.page_lines = layout.page_lines(rows_per_page)
+        yield from layout.pages(self.INITIAL_BASELINE, line_height, rows_per_page)
+
+    def page_figure(self, glyph_ids, x, y):
+        """
+        Dibuja una página en una figura nueva.
+        """
+        fig = self.new_page()
+
+        # Todos los trazos de la página se dibujan de una sola vez
+        self.draw_segments(self.ax, self.glyphs.place(glyph_ids, x, y))
+
+        if self.caption_position:
+            for caption, x_pos, baseline_y in zip(self.glyphs.captions(glyph_ids), x, y):
+                self.draw_caption(self.ax, caption, (x_pos, baseline_y), self.size, self.caption_position)
+
+        return fig
 
     def generate_text_encoded(self, input_content, letter_spacing=0.4, line_spacing=0.6):
         """
         Esta función genera el texto codificado (sin letras visibles).
         """
-        self.fig, self.ax = plt.subplots(figsize=(12, 8))
-
-        self.draw_text(
+        self.pages = self.draw_text(
             input_content,
             letter_spacing=letter_spacing,
             line_spacing=line_spacing,
@@ -180,17 +167,11 @@ class SymbolicEncoder:
             dotted_guidelines=True
         )
 
-        self.ax.set_xlim(0, self.SCREEN_WIDTH)
-        self.ax.set_ylim(0, self.SCREEN_HEIGHT)
-        self.ax.axis('off')
-
     def generate_text_solution(self, input_content, letter_spacing=0.4, line_spacing=0.6):
         """
         Esta función genera el texto cifrado con las letras debajo.
         """
-        self.fig, self.ax = plt.subplots(figsize=(12, 8))
-
-        self.draw_text(
+        self.pages = self.draw_text(
             input_content,
             letter_spacing=letter_spacing,
             line_spacing=line_spacing,
@@ -199,21 +180,16 @@ class SymbolicEncoder:
             dotted_guidelines=True
         )
 
-        self.ax.set_xlim(0, self.SCREEN_WIDTH)
-        self.ax.set_ylim(0, self.SCREEN_HEIGHT)
-        self.ax.axis('off')
-
     def generate_abc(self, letter_spacing=0.4, line_spacing=0.6):
         """
-        Esta función genera el abecedario completo con letras debajo.
+        Esta función genera el abecedario con letras debajo: todos los
+        caracteres del keymap, con tantos por línea como quepan.
         """
-        abc = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
-        abc_line = [abc]
-
-        self.fig, self.ax = plt.subplots(figsize=(12, 8))
+        letter_box_width = self.size * letter_spacing
+        per_line = line_capacity(self.SCREEN_WIDTH - self.MARGIN_RIGHT - self.MARGIN_LEFT, letter_box_width)
 
-        self.draw_text(
-            abc_line,
+        self.pages = self.draw_text(
+            glyph_sheet(len(self.glyphs), per_line, self.MARGIN_LEFT, letter_box_width),
             letter_spacing=letter_spacing,
             line_spacing=line_spacing,
             show_letters=True,
@@ -221,16 +197,69 @@ class SymbolicEncoder:
             dotted_guidelines=True
         )
 
-        self.ax.set_xlim(0, self.SCREEN_WIDTH)
-        self.ax.set_ylim(0, self.SCREEN_HEIGHT)
-        self.ax.axis('off')
-
-    def save_output(self, output_filename):
+    def save_output(self, output_filename, force=False):
         """
-        Guarda la figura actual en el archivo de salida.
+        Guarda las páginas generadas en el archivo de salida, una a una.
+        Un PDF recibe todas las páginas; otros formatos, un archivo por página.
+        Sólo se redibujan las páginas que cambiaron desde la salida anterior
+        (`force` las redibuja todas): en un PDF cada página se guarda también
+        como PDF propio en una caché junto a la salida y el documento se arma
+        uniéndolas.
         """
-        if self.fig:
-            self.fig.savefig(output_filename, bbox_inches='tight', dpi=300)
-            print(f"Archivo generado exitosamente: {output_filename}")
-        else:
+        if self.pages is None:
             print("Error: no hay figura para guardar.")
+            return
+
+        import matplotlib.pyplot as plt
+
+        # Recorrer las páginas fija también la leyenda y las líneas de cada una
+        pages = list(self.pages)
+        extension = os.path.splitext(output_filename)[1].lower()
+        style = style_digest(
+            type(self).__module__,
+            extension,
+            self.caption_position,
+            300,
+            (self.SCREEN_WIDTH, self.SCREEN_HEIGHT),
+            self.glyphs.chars,
+            self.glyphs.segments.tobytes(),
+        )
+        pages_filename = page_cache(output_filename) if extension == ".pdf" else output_filename
+        os.makedirs(os.path.dirname(pages_filename) or ".", exist_ok=True)
+
+        for number, page in incremental_pages(pages_filename, pages, style, self.page_lines, force):
+            with instrumentation.stage("draw"):
+                fig = self.page_figure(*page)
+            with instrumentation.stage("save"):
+                # Sin fecha de creación, la salida es idéntica byte a byte entre ejecuciones
+                fig.savefig(page_filename(pages_filename, number), bbox_inches='tight', dpi=300, metadata={'CreationDate': None} if extension == ".pdf" else None)
+            plt.close(fig)
+            if instrumentation.enabled:
+                instrumentation.page(number, output_filename)
+
+        if extension == ".pdf":
+            with instrumentation.stage("save"):
+                documents = []
+                for number in range(1, len(pages) + 1):
+                    with open(page_filename(pages_filename, number), "rb") as file:
+                        documents.append(file.read())
+                with open(output_filename, "wb") as file:
+                    file.write(merge_pdf_pages(documents))
+
+        self.pages = None
+        print(f"Archivo generado exitosamente: {output_filename}")
+
+    def render_output(self, mode, output_filename, input_content=None, letter_spacing=0.4, line_spacing=0.6, force=False):
+        """
+        Genera y guarda una de las salidas ('abc', 'solution' o 'encoded').
+        Se puede ejecutar en otro proceso: sólo necesita el layout ya calculado.
+        """
+        if mode == 'abc':
+            self.generate_abc(letter_spacing=letter_spacing, line_spacing=line_spacing)
+        elif mode == 'solution':
+            self.generate_text_solution(input_content, letter_spacing=letter_spacing, line_spacing=line_spacing)
+        elif mode == 'encoded':
+            self.generate_text_encoded(input_content, letter_spacing=letter_spacing, line_spacing=line_spacing)
+        else:
+            raise ValueError(f"Modo de salida desconocido: '{mode}'")
+        self.save_output(output_filename, force)
@@ -0,0 +1,297 @@
+# symbolic_encoder_direct.py
+
+import os
+import zlib
+import struct
+import numpy as np
+from xml.sax.saxutils import escape
+from SymbolicEncoder import SymbolicEncoder as MatplotlibEncoder
+from Instrumentation import instrumentation
+from PageManifest import page_filename, style_digest, incremental_pages
+
+# Versión del dibujo de las páginas; se sube cuando cambia para no reusar páginas viejas
+DRAWING_VERSION = 2
+
+# Fuente de mapa de bits 5x7 para las letras, dígitos y signos en PNG: cada fila es un entero de 5 bits
+FONT_5X7 = {
+    "A": (0x0E, 0x11, 0x11, 0x1F, 0x11, 0x11, 0x11),
+    "B": (0x1E, 0x11, 0x11, 0x1E, 0x11, 0x11, 0x1E),
+    "C": (0x0E, 0x11, 0x10, 0x10, 0x10, 0x11, 0x0E),
+    "D": (0x1E, 0x11, 0x11, 0x11, 0x11, 0x11, 0x1E),
+    "E": (0x1F, 0x10, 0x10, 0x1E, 0x10, 0x10, 0x1F),
+    "F": (0x1F, 0x10, 0x10, 0x1E, 0x10, 0x10, 0x10),
+    "G": (0x0E, 0x11, 0x10, 0x17, 0x11, 0x11, 0x0F),
+    "H": (0x11, 0x11, 0x11, 0x1F, 0x11, 0x11, 0x11),
+    "I": (0x0E, 0x04, 0x04, 0x04, 0x04, 0x04, 0x0E),
+    "J": (0x07, 0x02, 0x02, 0x02, 0x02, 0x12, 0x0C),
+    "K": (0x11, 0x12, 0x14, 0x18, 0x14, 0x12, 0x11),
+    "L": (0x10, 0x10, 0x10, 0x10, 0x10, 0x10, 0x1F),
+    "M": (0x11, 0x1B, 0x15, 0x15, 0x11, 0x11, 0x11),
+    "N": (0x11, 0x11, 0x19, 0x15, 0x13, 0x11, 0x11),
+    "O": (0x0E, 0x11, 0x11, 0x11, 0x11, 0x11, 0x0E),
+    "P": (0x1E, 0x11, 0x11, 0x1E, 0x10, 0x10, 0x10),
+    "Q": (0x0E, 0x11, 0x11, 0x11, 0x15, 0x12, 0x0D),
+    "R": (0x1E, 0x11, 0x11, 0x1E, 0x14, 0x12, 0x11),
+    "S": (0x0F, 0x10, 0x10, 0x0E, 0x01, 0x01, 0x1E),
+    "T": (0x1F, 0x04, 0x04, 0x04, 0x04, 0x04, 0x04),
+    "U": (0x11, 0x11, 0x11, 0x11, 0x11, 0x11, 0x0E),
+    "V": (0x11, 0x11, 0x11, 0x11, 0x11, 0x0A, 0x04),
+    "W": (0x11, 0x11, 0x11, 0x15, 0x15, 0x15, 0x0A),
+    "X": (0x11, 0x11, 0x0A, 0x04, 0x0A, 0x11, 0x11),
+    "Y": (0x11, 0x11, 0x0A, 0x04, 0x04, 0x04, 0x04),
+    "Z": (0x1F, 0x01, 0x02, 0x04, 0x08, 0x10, 0x1F),
+    "0": (0x0E, 0x11, 0x13, 0x15, 0x19, 0x11, 0x0E),
+    "1": (0x04, 0x0C, 0x04, 0x04, 0x04, 0x04, 0x0E),
+    "2": (0x0E, 0x11, 0x01, 0x02, 0x04, 0x08, 0x1F),
+    "3": (0x1F, 0x02, 0x04, 0x02, 0x01, 0x11, 0x0E),
+    "4": (0x02, 0x06, 0x0A, 0x12, 0x1F, 0x02, 0x02),
+    "5": (0x1F, 0x10, 0x1E, 0x01, 0x01, 0x11, 0x0E),
+    "6": (0x06, 0x08, 0x10, 0x1E, 0x11, 0x11, 0x0E),
+    "7": (0x1F, 0x01, 0x02, 0x04, 0x08, 0x08, 0x08),
+    "8": (0x0E, 0x11, 0x11, 0x0E, 0x11, 0x11, 0x0E),
+    "9": (0x0E, 0x11, 0x11, 0x0F, 0x01, 0x02, 0x0C),
+    ".": (0x00, 0x00, 0x00, 0x00, 0x00, 0x0C, 0x0C),
+    ",": (0x00, 0x00, 0x00, 0x00, 0x0C, 0x04, 0x08),
+    ";": (0x00, 0x0C, 0x0C, 0x00, 0x0C, 0x04, 0x08),
+    ":": (0x00, 0x0C, 0x0C, 0x00, 0x0C, 0x0C, 0x00),
+    "!": (0x04, 0x04, 0x04, 0x04, 0x04, 0x00, 0x04),
+    "?": (0x0E, 0x11, 0x01, 0x02, 0x04, 0x00, 0x04),
+    "-": (0x00, 0x00, 0x00, 0x1F, 0x00, 0x00, 0x00),
+    "'": (0x0C, 0x04, 0x08, 0x00, 0x00, 0x00, 0x00),
+}
+# Las letras sin mapa de bits se dibujan como un recuadro
+MISSING_5X7 = (0x1F, 0x11, 0x11, 0x11, 0x11, 0x11, 0x1F)
+
+
+def png_bytes(image):
+    """
+    Codifica una imagen en escala de grises (uint8) como PNG, sin dependencias externas.
+    """
+    height, width = image.shape
+    # Cada fila va precedida por el tipo de filtro (0: ninguno)
+    raw = np.hstack((np.zeros((height, 1), dtype=np.uint8), image)).tobytes()
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    return b"".join((
+        b"\x89PNG\r\n\x1a\n",
+        chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0)),
+        chunk(b"IDAT", zlib.compress(raw, 6)),
+        chunk(b"IEND", b""),
+    ))
+
+
+def stamp_points(image, x, y, offsets_x, offsets_y):
+    """
+    Pinta de negro los píxeles (x + dx, y + dy) para cada punto y cada desplazamiento.
+    """
+    xs = (np.rint(x)[:, None] + offsets_x).astype(np.intp).ravel()
+    ys = (np.rint(y)[:, None] + offsets_y).astype(np.intp).ravel()
+    inside = (xs >= 0) & (xs < image.shape[1]) & (ys >= 0) & (ys < image.shape[0])
+    image[ys[inside], xs[inside]] = 0
+
+
+def rasterize_segments(image, segments, line_width):
+    """
+    Dibuja los segmentos (N, 4) en píxeles con el grosor dado: cada segmento
+    se muestrea cada medio píxel y cada muestra se estampa como un disco.
+    """
+    segments = np.asarray(segments, dtype=float).reshape(-1, 4)
+    if len(segments) == 0:
+        return
+    x1, y1, x2, y2 = segments.T
+    steps = np.ceil(np.hypot(x2 - x1, y2 - y1) * 2).astype(np.intp) + 1
+    owner = np.repeat(np.arange(len(segments)), steps)
+    starts = np.cumsum(steps) - steps
+    t = (np.arange(len(owner)) - starts[owner]) / np.maximum(steps[owner] - 1, 1)
+    x = x1[owner] + (x2 - x1)[owner] * t
+    y = y1[owner] + (y2 - y1)[owner] * t
+
+    radius = max(line_width / 2, 0.5)
+    reach = int(np.ceil(radius))
+    offsets_y, offsets_x = np.mgrid[-reach:reach + 1, -reach:reach + 1]
+    disk = offsets_x ** 2 + offsets_y ** 2 <= radius ** 2
+    stamp_points(image, x, y, offsets_x[disk], offsets_y[disk])
+
+
+class SymbolicEncoder(MatplotlibEncoder):
+    """
+    Reparte el texto igual que el encoder de matplotlib, pero escribe cada
+    página directamente como SVG o PNG, sin matplotlib.
+    """
+
+    def __init__(self, keymap_file, size, screen_width=1200, screen_height=800, margin_left=10, margin_right=10, initial_baseline=750, margin_bottom=10, pixels_per_unit=2):
+        super().__init__(keymap_file, size, screen_width, screen_height, margin_left, margin_right, initial_baseline, margin_bottom)
+        self.PIXELS_PER_UNIT = pixels_per_unit
+
+    def caption_geometry(self, letter_position):
+        """
+        Devuelve el desplazamiento (dx, dy) y el tamaño de letra de la leyenda,
+        igual que draw_caption en los otros backends.
+        """
+        if letter_position == 'below':
+            return self.size * 0.4, -self.size * 1.2, self.size * 0.2
+        return self.size * 0.2, -self.size * 0.5, self.size * 0.4
+
+    def page_svg(self, glyph_ids, x, y):
+        """
+        Genera el SVG de una página: cada glifo distinto se define una vez
+        en <defs> y cada aparición es un <use> desplazado.
+        """
+        lines = [
+            '<?xml version="1.0" encoding="UTF-8"?>',
+            f'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+            f'width="{self.SCREEN_WIDTH}" height="{self.SCREEN_HEIGHT}" viewBox="0 0 {self.SCREEN_WIDTH} {self.SCREEN_HEIGHT}">',
+            '<rect width="100%" height="100%" fill="white"/>',
+            '<defs>',
+        ]
+        for glyph_id in np.unique(glyph_ids).tolist():
+            segments = self.glyphs.segments[self.glyphs.offsets[glyph_id]:self.glyphs.offsets[glyph_id + 1]]
+            # En SVG el eje y crece hacia abajo
+            path = " ".join(f"M{x1:.2f} {-y1:.2f}L{x2:.2f} {-y2:.2f}" for x1, y1, x2, y2 in segments.tolist())
+            lines.append(f'<g id="g{glyph_id}"><path d="{path}" stroke="black" stroke-width="2" fill="none"/>')
+            if self.caption_position:
+                dx, dy, font_size = self.caption_geometry(self.caption_position)
+                lines.append(
+                    f'<text x="{dx:.2f}" y="{-dy:.2f}" font-family="Helvetica, Arial, sans-serif" '
+                    f'font-size="{font_size:.2f}" text-anchor="middle">{escape(self.glyphs.chars[glyph_id].upper())}</text>'
+                )
+            lines.append('</g>')
+        lines.append('</defs>')
+        lines.extend(
+            f'<use xlink:href="#g{glyph_id}" x="{x_pos:.2f}" y="{self.SCREEN_HEIGHT - baseline_y:.2f}"/>'
+            for glyph_id, x_pos, baseline_y in zip(glyph_ids.tolist(), x.tolist(), y.tolist())
+        )
+        lines.append('</svg>')
+        return "\n".join(lines) + "\n"
+
+    def page_png(self, glyph_ids, x, y):
+        """
+        Rasteriza una página en escala de grises con NumPy.
+        """
+        scale = self.PIXELS_PER_UNIT
+        image = np.full((int(round(self.SCREEN_HEIGHT * scale)), int(round(self.SCREEN_WIDTH * scale))), 255, dtype=np.uint8)
+
+        # Coordenadas en píxeles, con y hacia abajo
+        segments = self.glyphs.place(glyph_ids, x, y) * scale
+        segments[:, 1::2] = image.shape[0] - segments[:, 1::2]
+        rasterize_segments(image, segments, 2 * scale)
+
+        if self.caption_position and len(glyph_ids):
+            self.rasterize_captions(image, glyph_ids, x, y)
+        return image
+
+    def rasterize_captions(self, image, glyph_ids, x, y):
+        """
+        Dibuja las letras de la solución con la fuente 5x7, todas a la vez.
+        """
+        scale = self.PIXELS_PER_UNIT
+        dx, dy, font_size = self.caption_geometry(self.caption_position)
+        # La fuente ocupa 7 filas para la altura de las mayúsculas (~0.7 del tamaño)
+        cell = max(font_size * 0.7 / 7 * scale, 1)
+
+        # Píxeles encendidos (fila, columna) de la letra de cada glifo
+        bitmaps = [FONT_5X7.get(char.upper(), MISSING_5X7) for char in self.glyphs.chars]
+        bits = np.array(bitmaps, dtype=np.uint8)[:, :, None] >> np.arange(4, -1, -1) & 1
+        counts = bits.reshape(len(bitmaps), -1).sum(axis=1)
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+        font_rows, font_columns = np.nonzero(bits.reshape(-1, 5))
+        font_rows = font_rows % 7
+
+        lit = counts[glyph_ids]
+        owner = np.repeat(np.arange(len(glyph_ids)), lit)
+        within = np.arange(len(owner)) - (np.cumsum(lit) - lit)[owner]
+        pixel = offsets[glyph_ids][owner] + within
+
+        # Esquina superior izquierda de cada letra, centrada como drawCentredString
+        left = (x[owner] + dx) * scale - 2.5 * cell
+        top = image.shape[0] - (y[owner] + dy) * scale - 7 * cell
+        reach = int(np.ceil(cell))
+        offsets_y, offsets_x = np.mgrid[0:reach, 0:reach]
+        stamp_points(
+            image,
+            left + font_columns[pixel] * cell,
+            top + font_rows[pixel] * cell,
+            offsets_x.ravel(),
+            offsets_y.ravel(),
+        )
+
+    @staticmethod
+    def output_extension(extension):
+        extension = extension.lower()
+        if extension not in (".svg", ".png"):
+            raise ValueError(f"Formato no soportado: '{extension}' (use .svg o .png)")
+        return extension
+
+    def page_bytes(self, extension, glyph_ids, x, y):
+        """Contenido de una página como bytes en el formato pedido ('.svg' o '.png')."""
+        if self.output_extension(extension) == ".svg":
+            return self.page_svg(glyph_ids, x, y).encode("utf-8")
+        return png_bytes(self.page_png(glyph_ids, x, y))
+
+    def output_pages(self, extension):
+        """
+        Recorre las páginas generadas y devuelve el contenido de cada una
+        como bytes en el formato pedido ('.svg' o '.png').
+        """
+        extension = self.output_extension(extension)
+        for glyph_ids, x, y in self.pages:
+            yield self.page_bytes(extension, glyph_ids, x, y)
+
+    def save_output(self, output_filename, force=False):
+        """
+        Guarda las páginas generadas como SVG o PNG según la extensión,
+        un archivo por página. Sólo se redibujan las páginas que cambiaron
+        desde la salida anterior; `force` las redibuja todas.
+        """
+        if self.pages is None:
+            print("Error: no hay figura para guardar.")
+            return
+
+        extension = self.output_extension(os.path.splitext(output_filename)[1])
+        # Recorrer las páginas fija también la leyenda y las líneas de cada una
+        pages = list(self.pages)
+        style = style_digest(
+            DRAWING_VERSION,
+            type(self).__module__,
+            extension,
+            self.caption_position,
+            self.PIXELS_PER_UNIT,
+            (self.SCREEN_WIDTH, self.SCREEN_HEIGHT),
+            self.glyphs.chars,
+            self.glyphs.segments.tobytes(),
+        )
+
+        for number, (glyph_ids, x, y) in incremental_pages(output_filename, pages, style, self.page_lines, force):
+            with instrumentation.stage("draw"):
+                content = self.page_bytes(extension, glyph_ids, x, y)
+            with instrumentation.stage("save"):
+                with open(page_filename(output_filename, number), "wb") as file:
+                    file.write(content)
+            if instrumentation.enabled:
+                instrumentation.page(number, output_filename)
+
+        self.pages = None
+        print(f"Archivo generado exitosamente: {output_filename}")
+
+    def generate_output(self, mode, input_content=None, letter_spacing=0.4, line_spacing=0.6):
+        """
+        Prepara las páginas de una de las salidas ('abc', 'solution' o 'encoded').
+        """
+        if mode == 'abc':
+            self.generate_abc(letter_spacing=letter_spacing, line_spacing=line_spacing)
+        elif mode == 'solution':
+            self.generate_text_solution(input_content, letter_spacing=letter_spacing, line_spacing=line_spacing)
+        elif mode == 'encoded':
+            self.generate_text_encoded(input_content, letter_spacing=letter_spacing, line_spacing=line_spacing)
+        else:
+            raise ValueError(f"Modo de salida desconocido: '{mode}'")
+
+    def render_output(self, mode, output_filename, input_content=None, letter_spacing=0.4, line_spacing=0.6, force=False):
+        """
+        Genera y guarda una de las salidas ('abc', 'solution' o 'encoded').
+        Se puede ejecutar en otro proceso: sólo necesita el layout ya calculado.
+        """
+        self.generate_output(mode, input_content, letter_spacing, line_spacing)
+        self.save_output(output_filename, force)
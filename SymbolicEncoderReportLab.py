@@ -1,21 +1,23 @@
 # symbolic_encoder.py
 
+import os
 import json
-import unicodedata
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
+import numpy as np
+from GlyphTable import DEFAULT_LINES_MAP
+from KeymapCache import load_compiled_keymap
+from TextLayout import TextLayout, wrap_text, rows_in_page, line_capacity, glyph_sheet
+from InputReader import read_lines
+from Instrumentation import instrumentation
 
 class SymbolicEncoder:
-    LINES_MAP = {
-        "bottom_left":    [10, 30, 20, 15],
-        "bottom_right":   [30, 30, 20, 15],
-        "center":         [10, 30, 30, 30],
-        "top_left":       [10, 30, 20, 45],
-        "top_right":      [30, 30, 20, 45],
-    }
-
-    def __init__(self, keymap_file, size, screen_width=612, screen_height=792, margin_left=40, margin_right=40, initial_baseline=700):
-        self.page_width, self.page_height = letter
+    # Tamaño carta en puntos (reportlab.lib.pagesizes.letter), sin importar reportlab al cargar el módulo
+    PAGE_SIZE = (612.0, 792.0)
+
+    # Trazos por defecto; el archivo keymap puede añadir o redefinir trazos
+    LINES_MAP = DEFAULT_LINES_MAP
+
+    def __init__(self, keymap_file, size, screen_width=612, screen_height=792, margin_left=40, margin_right=40, initial_baseline=700, margin_bottom=40):
+        self.page_width, self.page_height = self.PAGE_SIZE
         self.keymap_file = keymap_file
         self.size = size
         self.SCREEN_WIDTH = screen_width
@@ -23,14 +25,8 @@ class SymbolicEncoder:
         self.MARGIN_LEFT = margin_left
         self.MARGIN_RIGHT = margin_right
         self.INITIAL_BASELINE = initial_baseline
-        self.keymap = self.load_keymap()
-
-    @staticmethod
-    def remove_accent(text):
-        return ''.join(
-            c for c in unicodedata.normalize('NFKD', text)
-            if not unicodedata.combining(c)
-        )
+        self.MARGIN_BOTTOM = margin_bottom
+        self.keymap, self.glyphs = load_compiled_keymap(self.keymap_file, self.LINES_MAP, self.size, self.load_keymap)
 
     def load_keymap(self):
         try:
@@ -46,105 +42,90 @@ class SymbolicEncoder:
             raise
 
     def read_file_content(self, input_file):
-        try:
-            with open(input_file, "r") as file:
-                content = file.readlines()
-            print("Contenido leído:", content)
-            return content
-        except FileNotFoundError:
-            print(f"El archivo {input_file} no se encuentra.")
-            raise
-        except Exception as e:
-            print(f"Error al leer el archivo {input_file}: {e}")
-            raise
+        return read_lines(input_file)
 
-    def draw_letter(self, c, letter_config, position, size, show_letters=False, letter_position='below', letter_char=None):
+    def draw_caption(self, c, letter_char, position, size, letter_position='below'):
         x_offset, baseline_y = position
-        scale = size / 50
-
-        for line_key in letter_config:
-            if line_key and line_key in self.LINES_MAP:
-                x1, y1, x2, y2 = self.LINES_MAP[line_key]
-
-                x1 = x_offset + x1 * scale
-                x2 = x_offset + x2 * scale
-                y1 = baseline_y - (y1 * scale)
-                y2 = baseline_y - (y2 * scale)
-
-                c.setLineWidth(2)
-                c.line(x1, y1, x2, y2)
-            else:
-                print(f"Advertencia: línea '{line_key}' no existe en LINES_MAP")
-
-        if show_letters and letter_char:
-            if letter_position == 'below':
-                c.setFont("Helvetica", size * 0.2)
-                c.drawCentredString(
-                    x_offset + (size * 0.4),
-                    baseline_y - (size * 1.2),
-                    letter_char.upper()
-                )
-            elif letter_position == 'inside':
-                c.setFont("Helvetica", size * 0.4)
-                c.drawCentredString(
-                    x_offset + (size * 0.2),
-                    baseline_y - (size * 0.5),
-                    letter_char.upper()
-                )
-
-    def check_fit(self, word, x_pos, letter_box_spacing):
-        word_width = len(word) * letter_box_spacing
-        return (x_pos + word_width) <= (self.SCREEN_WIDTH - self.MARGIN_RIGHT)
-
+        if letter_position == 'below':
+            c.setFont("Helvetica", size * 0.2)
+            c.drawCentredString(
+                x_offset + (size * 0.4),
+                baseline_y - (size * 1.2),
+                letter_char.upper()
+            )
+        elif letter_position == 'inside':
+            c.setFont("Helvetica", size * 0.4)
+            c.drawCentredString(
+                x_offset + (size * 0.2),
+                baseline_y - (size * 0.5),
+                letter_char.upper()
+            )
+
+    def glyph_form_name(self, glyph_id, letter_position):
+        return f"Glifo{glyph_id}{letter_position.capitalize()}"
+
+    def define_glyph_forms(self, c, glyph_ids, show_letters=False, letter_position='below'):
+        """
+        Define cada glifo distinto (con su letra, si se pide) una sola vez
+        por documento como form XObject, relativo a (x, baseline_y).
+        """
+        caption_position = letter_position if show_letters else 'none'
+        for glyph_id in np.unique(glyph_ids).tolist():
+            # Margen holgado para que ni el trazo ni la letra queden recortados
+            c.beginForm(self.glyph_form_name(glyph_id, caption_position), -self.size, -2 * self.size, 2 * self.size, self.size)
+            c.setLineWidth(2)
+            c.lines(self.glyphs.segments[self.glyphs.offsets[glyph_id]:self.glyphs.offsets[glyph_id + 1]].tolist())
+            if show_letters:
+                self.draw_caption(c, self.glyphs.chars[glyph_id], (0, 0), self.size, letter_position)
+            c.endForm()
+
+    def draw_glyphs(self, c, glyph_ids, x, y, show_letters=False, letter_position='below'):
+        caption_position = letter_position if show_letters else 'none'
+        for glyph_id, x_pos, baseline_y in zip(glyph_ids.tolist(), x.tolist(), y.tolist()):
+            c.saveState()
+            c.translate(x_pos, baseline_y)
+            c.doForm(self.glyph_form_name(glyph_id, caption_position))
+            c.restoreState()
+
+    def layout_text(self, input_content, letter_spacing=0.4, trim_words=False, line_breaking='greedy'):
+        return wrap_text(self.glyphs, input_content, self.size * letter_spacing, self.MARGIN_LEFT, self.SCREEN_WIDTH - self.MARGIN_RIGHT, trim_words, line_breaking)
+
+    @instrumentation.timed("draw")
     def draw_text(self, c, input_content, letter_spacing=0.4, line_spacing=0.6, show_letters=False, letter_position='below', trim_words=False):
-        letter_box_width = self.size * letter_spacing
         line_height = self.size * line_spacing
 
         if show_letters and letter_position == 'below':
             line_height += self.size * 0.3
 
-        baseline_y = self.INITIAL_BASELINE
-        x_pos = self.MARGIN_LEFT
-
-        for line in input_content:
-            text_line = line.strip('\n')
-            text_line = self.remove_accent(text_line)
-
-            if not text_line:
-                baseline_y -= line_height
-                x_pos = self.MARGIN_LEFT
-                continue
-
-            words = text_line.split(" ")
-            for word in words:
-                word_fits = self.check_fit(word, x_pos, letter_box_width)
-                if not word_fits:
-                    baseline_y -= line_height
-                    x_pos = self.MARGIN_LEFT
-
-                for letter in word:
-                    if letter.lower() in self.keymap:
-                        self.draw_letter(
-                            c,
-                            self.keymap[letter.lower()],
-                            (x_pos, baseline_y),
-                            self.size,
-                            show_letters=show_letters,
-                            letter_position=letter_position,
-                            letter_char=letter
-                        )
-                        x_pos += letter_box_width
-                    else:
-                        print(f"Letra no encontrada en keymap: '{letter}'")
-
-                if not trim_words:
-                    x_pos += letter_box_width
-
-            baseline_y -= line_height
-            x_pos = self.MARGIN_LEFT
+        descent = self.size * (1.2 if show_letters and letter_position == 'below' else 0.9)
+        rows_per_page = rows_in_page(self.INITIAL_BASELINE - descent - self.MARGIN_BOTTOM, line_height)
+
+        layout = input_content
+        if not isinstance(layout, TextLayout):
+            layout = self.layout_text(input_content, letter_spacing, trim_words)
+
+        self.define_glyph_forms(c, layout.glyph_ids, show_letters, letter_position)
+
+        for number, (glyph_ids, x, y) in enumerate(layout.pages(self.INITIAL_BASELINE, line_height, rows_per_page), start=1):
+            self.draw_glyphs(c, glyph_ids, x, y, show_letters, letter_position)
+            c.showPage()
+            if instrumentation.enabled:
+                instrumentation.page(number)
+
+    def new_canvas(self, output_filename):
+        from reportlab.pdfgen import canvas
+
+        return canvas.Canvas(output_filename, pagesize=self.PAGE_SIZE, invariant=1)
+
+    def save_canvas(self, c, output_filename):
+        with instrumentation.stage("save"):
+            c.save()
+        # Una salida en memoria (por ejemplo, la del servicio) no se anuncia
+        if isinstance(output_filename, (str, os.PathLike)):
+            print(f"Archivo generado exitosamente: {output_filename}")
 
     def generate_text_encoded(self, input_content, output_filename, letter_spacing=0.4, line_spacing=0.6):
-        c = canvas.Canvas(output_filename, pagesize=letter)
+        c = self.new_canvas(output_filename)
         self.draw_text(
             c,
             input_content,
@@ -153,12 +134,10 @@ class SymbolicEncoder:
             show_letters=False,
             letter_position='none'
         )
-        c.showPage()
-        c.save()
-        print(f"Archivo generado exitosamente: {output_filename}")
+        self.save_canvas(c, output_filename)
 
     def generate_text_solution(self, input_content, output_filename, letter_spacing=0.4, line_spacing=0.6):
-        c = canvas.Canvas(output_filename, pagesize=letter)
+        c = self.new_canvas(output_filename)
         self.draw_text(
             c,
             input_content,
@@ -167,23 +146,30 @@ class SymbolicEncoder:
             show_letters=True,
             letter_position='below'
         )
-        c.showPage()
-        c.save()
-        print(f"Archivo generado exitosamente: {output_filename}")
+        self.save_canvas(c, output_filename)
 
     def generate_abc(self, output_filename, letter_spacing=0.4, line_spacing=0.6):
-        abc = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
-        abc_line = [abc[i:i+5] for i in range(0, len(abc), 5)]
+        # Todos los caracteres del keymap, de cinco en cinco
+        letter_box_width = self.size * letter_spacing
+        per_line = min(5, line_capacity(self.SCREEN_WIDTH - self.MARGIN_RIGHT - self.MARGIN_LEFT, letter_box_width))
 
-        c = canvas.Canvas(output_filename, pagesize=letter)
+        c = self.new_canvas(output_filename)
         self.draw_text(
             c,
-            abc_line,
+            glyph_sheet(len(self.glyphs), per_line, self.MARGIN_LEFT, letter_box_width),
             letter_spacing=letter_spacing,
             line_spacing=line_spacing,
             show_letters=True,
             letter_position='below'
         )
-        c.showPage()
-        c.save()
-        print(f"Archivo generado exitosamente: {output_filename}")
+        self.save_canvas(c, output_filename)
+
+    def render_output(self, mode, output_filename, input_content=None, letter_spacing=0.4, line_spacing=0.6):
+        if mode == 'abc':
+            self.generate_abc(output_filename, letter_spacing=letter_spacing, line_spacing=line_spacing)
+        elif mode == 'solution':
+            self.generate_text_solution(input_content, output_filename, letter_spacing=letter_spacing, line_spacing=line_spacing)
+        elif mode == 'encoded':
+            self.generate_text_encoded(input_content, output_filename, letter_spacing=letter_spacing, line_spacing=line_spacing)
+        else:
+            raise ValueError(f"Modo de salida desconocido: '{mode}'")
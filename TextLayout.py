@@ -0,0 +1,253 @@
+# text_layout.py
+
+import json
+import numpy as np
+from GlyphTable import word_offsets, page_slices
+from LineBreaker import break_paragraph
+from Instrumentation import instrumentation
+
+# Archivo de layout: firma, largo del encabezado JSON (uint32) y arreglos alineados
+LAYOUT_MAGIC = b"TLAYOUT1"
+LAYOUT_ALIGN = 64
+LAYOUT_ARRAYS = ("glyph_ids", "x", "rows", "line_rows")
+
+
+def glyph_id_dtype(glyph_ids):
+    """uint8 mientras el keymap tenga como mucho 256 glifos; si no, uint16."""
+    return np.uint8 if len(glyph_ids) == 0 or int(glyph_ids.max()) < 256 else np.uint16
+
+
+def aligned(size):
+    return -(-size // LAYOUT_ALIGN) * LAYOUT_ALIGN
+
+
+def line_capacity(line_width, letter_box_width):
+    """Cuántas columnas de glifos caben en una línea de `line_width` (al menos una)."""
+    return max(1, int(line_width / letter_box_width + 1e-9))
+
+
+def rows_in_page(usable_height, line_height):
+    """
+    Cuántas líneas caben en una página cuando la primera línea base y el
+    pie del último símbolo están separados por `usable_height`.
+    """
+    return max(1, int(usable_height // line_height) + 1)
+
+
+class TextLayout:
+    """
+    Texto ya repartido en líneas: id de glifo, x y fila de cada glifo, en
+    arreglos paralelos compactos (uint8/uint16, float32 e int32: 9 bytes por
+    glifo con un keymap de hasta 256 letras).
+    Se calcula una sola vez y lo comparten todas las salidas; la posición
+    vertical y la página dependen del alto de línea, así que se calculan
+    (y se guardan) una vez por cada variante.
+    `line_rows` es la fila donde empieza cada línea de entrada, más una
+    final con el total de filas; permite saber en qué páginas cae cada línea.
+    Se puede guardar con `save` y abrir con `load` como memoria mapeada:
+    un layout abierto así se envía a otros procesos como la ruta del archivo.
+    """
+
+    def __init__(self, glyph_ids, x, rows, line_rows=None, path=None):
+        self.glyph_ids = glyph_ids
+        self.x = x
+        self.rows = rows
+        self.line_rows = line_rows
+        self.path = path
+        self._pages = {}
+
+    @classmethod
+    def from_words(cls, glyph_ids, word_counts, word_columns, word_rows, margin_left, letter_box_width, line_rows=None):
+        """
+        Construye el layout a partir de los ids de glifo (en orden), cuántos
+        tiene cada palabra y la columna/fila donde empieza, en una sola
+        pasada vectorizada.
+        """
+        owner, within = word_offsets(word_counts)
+        glyph_ids = np.asarray(glyph_ids)
+        glyph_ids = glyph_ids.astype(glyph_id_dtype(glyph_ids))
+        x = (margin_left + (np.asarray(word_columns, dtype=float)[owner] + within) * letter_box_width).astype(np.float32)
+        rows = np.asarray(word_rows, dtype=np.int32)[owner]
+        if line_rows is not None:
+            line_rows = np.asarray(line_rows, dtype=np.int32)
+        return cls(glyph_ids, x, rows, line_rows)
+
+    def __len__(self):
+        return len(self.glyph_ids)
+
+    @property
+    def nbytes(self):
+        """Bytes que ocupan los arreglos del layout (sin las páginas calculadas)."""
+        return sum(array.nbytes for array in (self.glyph_ids, self.x, self.rows, self.line_rows) if array is not None)
+
+    def __getstate__(self):
+        # Un layout en archivo viaja como su ruta; las páginas se recalculan en cada proceso
+        if self.path is not None:
+            return {"path": self.path}
+        state = self.__dict__.copy()
+        state["_pages"] = {}
+        return state
+
+    def __setstate__(self, state):
+        if set(state) == {"path"}:
+            state = TextLayout.load(state["path"]).__dict__
+        self.__dict__.update(state)
+
+    def save(self, path):
+        """
+        Guarda los arreglos en un archivo que `load` puede mapear en memoria
+        sin copiarlo. Devuelve la ruta.
+        """
+        arrays = {name: getattr(self, name) for name in LAYOUT_ARRAYS if getattr(self, name) is not None}
+        header = {"arrays": {}}
+        offset = 0
+        for name, array in arrays.items():
+            header["arrays"][name] = {"dtype": array.dtype.str, "length": len(array), "offset": offset}
+            offset += aligned(array.nbytes)
+
+        encoded = json.dumps(header).encode("utf-8")
+        start = aligned(len(LAYOUT_MAGIC) + 4 + len(encoded))
+        with open(path, "wb") as file:
+            file.write(LAYOUT_MAGIC)
+            file.write(len(encoded).to_bytes(4, "little"))
+            file.write(encoded)
+            for name, array in arrays.items():
+                file.seek(start + header["arrays"][name]["offset"])
+                file.write(np.ascontiguousarray(array).tobytes())
+        return path
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Abre un layout guardado con `save`; con `mmap` los arreglos se leen
+        del archivo bajo demanda y los comparten todos los procesos que lo abren.
+        """
+        with open(path, "rb") as file:
+            if file.read(len(LAYOUT_MAGIC)) != LAYOUT_MAGIC:
+                raise ValueError(f"{path} no es un archivo de layout.")
+            length = int.from_bytes(file.read(4), "little")
+            header = json.loads(file.read(length))
+        start = aligned(len(LAYOUT_MAGIC) + 4 + length)
+
+        arrays = {}
+        for name, info in header["arrays"].items():
+            dtype = np.dtype(info["dtype"])
+            if info["length"] == 0:
+                arrays[name] = np.empty(0, dtype=dtype)
+            elif mmap:
+                arrays[name] = np.memmap(path, dtype=dtype, mode="r", offset=start + info["offset"], shape=(info["length"],))
+            else:
+                arrays[name] = np.fromfile(path, dtype=dtype, count=info["length"], offset=start + info["offset"])
+
+        return cls(
+            arrays["glyph_ids"],
+            arrays["x"],
+            arrays["rows"],
+            arrays.get("line_rows"),
+            path=path if mmap else None,
+        )
+
+    def pages(self, initial_baseline, line_height, rows_per_page):
+        """
+        Devuelve la lista de páginas (glyph_ids, x, baseline_y) para un alto de línea.
+        Cada página es una vista de los arreglos del layout, salvo baseline_y.
+        """
+        key = (initial_baseline, line_height, rows_per_page)
+        if key not in self._pages:
+            page, line_in_page = np.divmod(self.rows, rows_per_page)
+            # En float32 para no crear temporales de 8 bytes por glifo
+            y = line_in_page.astype(np.float32)
+            y *= -line_height
+            y += initial_baseline
+            del line_in_page
+            self._pages[key] = [
+                (self.glyph_ids[page_glyphs], self.x[page_glyphs], y[page_glyphs])
+                for page_glyphs in page_slices(page)
+            ]
+        return self._pages[key]
+
+    def page_lines(self, rows_per_page):
+        """
+        Devuelve, por página, la primera y la última línea de entrada (inclusive)
+        que tienen algo en ella, o None si no se conocen las líneas.
+        """
+        if self.line_rows is None or len(self.line_rows) < 2:
+            return None
+        page_count = int(self.rows[-1]) // rows_per_page + 1 if len(self.rows) else 1
+        starts = np.arange(page_count) * rows_per_page
+        first = np.searchsorted(self.line_rows[:-1], starts, side="right") - 1
+        last = np.searchsorted(self.line_rows[:-1], starts + rows_per_page, side="left") - 1
+        return np.column_stack((np.maximum(first, 0), np.maximum(last, 0))).tolist()
+
+
+@instrumentation.timed("layout")
+def wrap_text(glyphs, input_content, letter_box_width, margin_left, right_edge, trim_words=False, line_breaking='greedy'):
+    """
+    Reparte el texto en líneas y devuelve el TextLayout. Lo comparten todos
+    los encoders: sólo cambian el margen izquierdo y el borde derecho.
+    Con 'greedy' cada palabra va en la línea actual si cabe; con 'optimal'
+    cada párrafo se reparte con break_paragraph (líneas más parejas y
+    palabras largas partidas).
+    """
+    capacity = line_capacity(right_edge - margin_left, letter_box_width)
+    spacing = 0 if trim_words else 1
+
+    # Se guardan las líneas normalizadas y, por palabra, cuántos glifos tiene y la columna/fila donde empieza
+    text_lines = []
+    word_counts = []
+    word_columns = []
+    word_rows = []
+    line_rows = []
+    characters = 0
+    row = 0
+
+    for line in input_content:
+        line_rows.append(row)
+        characters += len(line)
+        text_line, words, counts = glyphs.encode_line(line.strip('\n'))
+
+        if not words:
+            row += 1
+            continue
+
+        text_lines.append(text_line)
+        if line_breaking == 'optimal':
+            pieces, columns, rows, used = break_paragraph(counts, capacity, spacing)
+            word_counts.extend(pieces)
+            word_columns.extend(columns)
+            word_rows.extend(row + piece_row for piece_row in rows)
+            row += used
+            continue
+
+        column = 0
+        for word, count in zip(words, counts):
+            x_pos = margin_left + column * letter_box_width
+            # Una palabra que no cabe ni en una línea vacía se deja desbordar sin saltar de línea
+            if x_pos + len(word) * letter_box_width > right_edge and column > 0:
+                row += 1
+                column = 0
+
+            word_counts.append(count)
+            word_columns.append(column)
+            word_rows.append(row)
+            column += count + spacing
+
+        row += 1
+
+    glyph_ids = glyphs.glyph_ids("".join(text_lines))
+    line_rows.append(row)
+    instrumentation.count("characters", characters)
+    instrumentation.count("glyphs", len(glyph_ids))
+    return TextLayout.from_words(glyph_ids, word_counts, word_columns, word_rows, margin_left, letter_box_width, line_rows)
+
+
+def glyph_sheet(glyph_count, per_line, margin_left, letter_box_width):
+    """
+    Layout con todos los glifos del keymap en orden, `per_line` por fila,
+    para el abecedario. No pasa por la normalización del texto, así que
+    aparece cada carácter del keymap, también dígitos y signos.
+    """
+    glyph_ids = np.arange(glyph_count)
+    row_count = -(-glyph_count // per_line)
+    counts = [min(per_line, glyph_count - row * per_line) for row in range(row_count)]
+    return TextLayout.from_words(glyph_ids, counts, [0] * row_count, range(row_count), margin_left, letter_box_width, range(row_count + 1))
@@ -1,22 +1,13 @@
 # main.py
 
 # -*- coding: utf-8 -*-
+import os
 import argparse
-from SymbolicEncoder import SymbolicEncoder
-
-def read_file_content(input_file):
-    """Lee el contenido de un archivo de texto y lo devuelve como una lista de líneas."""
-    try:
-        with open(input_file, "r") as file:
-            content = file.readlines()
-        print("Contenido leído:", content)
-        return content
-    except FileNotFoundError:
-        print(f"El archivo {input_file} no se encuentra.")
-        raise
-    except Exception as e:
-        print(f"Error al leer el archivo {input_file}: {e}")
-        raise
+import tempfile
+from InputReader import read_lines
+from LineBreaker import LINE_BREAKING
+from Instrumentation import instrumentation, configure_logging
+from EncoderJobs import load_encoder, run_jobs
 
 def main():
     parser = argparse.ArgumentParser(description="Genera un PDF o imagen con texto cifrado con SymbolicEncoder.")
@@ -29,46 +20,77 @@ def main():
     parser.add_argument("--letter-spacing", type=float, default=0.4, help="Espacio entre letras.")
     parser.add_argument("--line-spacing", type=float, default=0.6, help="Espacio entre líneas.")
     parser.add_argument("--keymapfile", type=str, default="keymap.json", help="Archivo keymap a cargar (default: keymap.json).")
+    parser.add_argument("--line-breaking", choices=LINE_BREAKING, default="greedy", help="Reparto de palabras en líneas: greedy llena cada línea; optimal las empareja y parte las palabras demasiado largas (default: greedy).")
+    parser.add_argument("--format", choices=["pdf", "svg", "png"], default="pdf", help="Formato de salida (default: pdf). svg y png no usan matplotlib.")
+    parser.add_argument("--jobs", type=int, default=1, help="Número de procesos para generar las salidas en paralelo (default: 1).")
+    parser.add_argument("--stats", choices=["off", "summary", "json"], default="off", help="Muestra tiempos por etapa y contadores al terminar: resumen o una línea JSON (default: off).")
+    parser.add_argument("--force", action="store_true", help="Redibuja todas las páginas aunque no hayan cambiado; sin esta opción se reusan las de la salida anterior (en PDF, desde la carpeta oculta .{archivo}.pages).")
 
     args = parser.parse_args()
+    configure_logging(args.stats)
 
     # Leer contenido del archivo de texto
     try:
-        input_content = read_file_content(args.i)
+        input_content = read_lines(args.i)
     except Exception as e:
         print(f"Error al leer el archivo de texto: {e}")
         return
 
-    # Crear instancia del SymbolicEncoder
-    encoder = SymbolicEncoder(
-        keymap_file=args.keymapfile,
-        size=args.size
-    )
+    # Crear instancia del SymbolicEncoder; svg y png se escriben directamente sin matplotlib
+    encoder = load_encoder("matplotlib" if args.format == "pdf" else "direct", args.keymapfile, args.size)
+
+    # El texto se reparte en líneas una sola vez para todas las salidas
+    try:
+        layout = encoder.layout_text(input_content, letter_spacing=args.letter_spacing, line_breaking=args.line_breaking)
+    except UnicodeDecodeError:
+        return
+
+    # Con varios procesos el layout se guarda en un archivo mapeado en memoria:
+    # cada worker recibe sólo la ruta en vez de una copia de los arreglos
+    shared = None
+    if args.jobs > 1:
+        from TextLayout import TextLayout
+
+        shared = tempfile.TemporaryDirectory()
+        layout = TextLayout.load(layout.save(os.path.join(shared.name, "layout.bin")))
+
+    jobs = []
 
     # Generar abecedario
     if not args.no_abc:
-        print("Generando abecedario...")
-        encoder.generate_abc()
-        encoder.save_output(f"{args.o}_abc.pdf")
+        jobs.append(("Generando abecedario...", encoder.render_output, dict(
+            mode='abc',
+            output_filename=f"{args.o}_abc.{args.format}",
+            force=args.force
+        )))
 
     # Generar texto cifrado + solución
     if not args.no_decoded:
-        print("Generando texto con solución...")
-        encoder.generate_text_solution(
-            input_content,
+        jobs.append(("Generando texto con solución...", encoder.render_output, dict(
+            mode='solution',
+            output_filename=f"{args.o}_decoded.{args.format}",
+            input_content=layout,
             letter_spacing=args.letter_spacing,
-            line_spacing=args.line_spacing
-        )
-        encoder.save_output(f"{args.o}_decoded.pdf")
+            line_spacing=args.line_spacing,
+            force=args.force
+        )))
 
     # Generar texto cifrado puro
-    print("Generando texto cifrado puro...")
-    encoder.generate_text_encoded(
-        input_content,
+    jobs.append(("Generando texto cifrado puro...", encoder.render_output, dict(
+        mode='encoded',
+        output_filename=f"{args.o}.{args.format}",
+        input_content=layout,
         letter_spacing=args.letter_spacing,
-        line_spacing=args.line_spacing
-    )
-    encoder.save_output(f"{args.o}.pdf")
+        line_spacing=args.line_spacing,
+        force=args.force
+    )))
+
+    try:
+        run_jobs(jobs, args.jobs)
+    finally:
+        if shared is not None:
+            shared.cleanup()
+    instrumentation.report()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,225 @@
+# main_batch.py
+
+# -*- coding: utf-8 -*-
+import os
+import sys
+import glob
+import json
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from GlyphTable import KeymapError
+from EncoderJobs import load_encoder
+from LineBreaker import LINE_BREAKING
+
+# Encoder del proceso actual; en el pool se recibe una sola vez por worker
+_encoder = None
+
+# Archivo en el directorio de salida con las opciones con que se generó cada salida
+STAMP_FILENAME = ".batch_stamps.json"
+
+# Errores de una sola entrada: se informan y el lote sigue con las demás
+INPUT_ERRORS = (OSError, UnicodeDecodeError, KeymapError)
+
+def init_worker(encoder):
+    """Guarda el encoder (ya con el keymap cargado) en el proceso del pool."""
+    global _encoder
+    _encoder = encoder
+
+def collect_inputs(sources, manifest=None):
+    """
+    Devuelve la lista ordenada de archivos de entrada a partir de directorios
+    (todos sus .txt), patrones glob o archivos sueltos, y de un manifiesto
+    opcional con una ruta por línea.
+    """
+    inputs = []
+    for source in sources:
+        if os.path.isdir(source):
+            inputs.extend(glob.glob(os.path.join(source, "*.txt")))
+        elif glob.has_magic(source):
+            inputs.extend(glob.glob(source))
+        else:
+            inputs.append(source)
+
+    if manifest:
+        with open(manifest, "r") as file:
+            for line in file:
+                path = line.strip()
+                if path and not path.startswith("#"):
+                    inputs.append(os.path.join(os.path.dirname(manifest), path))
+
+    return sorted(set(os.path.normpath(path) for path in inputs))
+
+def find_collisions(targets):
+    """
+    Recibe pares (salida, origen) y devuelve las salidas que escribiría más
+    de un origen, cada una con la lista de sus orígenes.
+    """
+    claimed = {}
+    for output, source in targets:
+        claimed.setdefault(os.path.normcase(os.path.abspath(output)), (output, []))[1].append(source)
+    return [(output, sources) for output, sources in claimed.values() if len(sources) > 1]
+
+def options_digest(options):
+    """Resumen de las opciones que cambian el contenido de una salida."""
+    return hashlib.sha256(json.dumps(options, sort_keys=True).encode("utf-8")).hexdigest()
+
+def load_stamps(filename):
+    """Lee el resumen de opciones de cada salida, por nombre de archivo; vacío si no hay."""
+    try:
+        with open(filename, "r", encoding="utf-8") as file:
+            stamps = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    return stamps if isinstance(stamps, dict) else {}
+
+def save_stamps(stamps, filename):
+    """Guarda el resumen de opciones de cada salida."""
+    with open(filename, "w", encoding="utf-8") as file:
+        json.dump(stamps, file, indent=4, sort_keys=True)
+
+def is_up_to_date(outputs, dependencies, stamps, digest):
+    """
+    Como make: las salidas están al día si todas existen, son más nuevas que
+    sus dependencias y se generaron con las mismas opciones (`digest`).
+    """
+    if any(stamps.get(os.path.basename(output)) != digest for output in outputs):
+        return False
+    try:
+        oldest_output = min(os.path.getmtime(output) for output in outputs)
+    except (OSError, ValueError):
+        return False
+    return oldest_output >= max(os.path.getmtime(dependency) for dependency in dependencies)
+
+def encode_file(input_file, output_base, no_decoded, letter_spacing, line_spacing, line_breaking='greedy'):
+    """Genera las salidas de un archivo de entrada con el encoder del proceso."""
+    input_content = _encoder.read_file_content(input_file)
+    layout = _encoder.layout_text(input_content, letter_spacing=letter_spacing, line_breaking=line_breaking)
+
+    if not no_decoded:
+        _encoder.render_output('solution', f"{output_base}_decoded.pdf", layout, letter_spacing, line_spacing)
+    _encoder.render_output('encoded', f"{output_base}.pdf", layout, letter_spacing, line_spacing)
+    return input_file
+
+def encode_abc(output_filename, letter_spacing, line_spacing):
+    """Genera el abecedario, común a todos los archivos del lote."""
+    _encoder.render_output('abc', output_filename, letter_spacing=letter_spacing, line_spacing=line_spacing)
+    return output_filename
+
+def record_result(source, outputs, digest, result, stamps, failed):
+    """
+    Espera el resultado de un trabajo (`result` lo devuelve o lanza su error).
+    Si terminó bien, sus salidas quedan al día con `digest`; si falló por su
+    entrada, se informa, se anota en `failed` y sus salidas no se sellan.
+    """
+    try:
+        print(f"Generado: {result()}")
+    except INPUT_ERRORS as e:
+        print(f"Error, se omite {source}: {e}")
+        failed.append(source)
+        return
+    stamps.update({os.path.basename(output): digest for output in outputs})
+
+def main():
+    parser = argparse.ArgumentParser(description="Cifra un lote de archivos de texto en un solo proceso.")
+
+    parser.add_argument("sources", nargs="*", help="Directorios, patrones glob o archivos de texto a cifrar.")
+    parser.add_argument("--manifest", type=str, help="Archivo con una ruta de entrada por línea.")
+    parser.add_argument("--output-dir", type=str, default="output", help="Directorio de salida (default: output).")
+    parser.add_argument("--backend", choices=["reportlab", "matplotlib"], default="reportlab", help="Backend de dibujo (default: reportlab).")
+    parser.add_argument("--no-abc", action="store_true", help="Indica si NO se debe generar el abecedario abc.pdf")
+    parser.add_argument("--no-decoded", action="store_true", help="Indica si NO se deben generar los archivos {filename}_decoded.pdf")
+    parser.add_argument("--size", type=int, default=50, help="Tamaño de la letra. Por defecto es 50.")
+    parser.add_argument("--letter-spacing", type=float, default=0.4, help="Espacio entre letras.")
+    parser.add_argument("--line-spacing", type=float, default=0.6, help="Espacio entre líneas.")
+    parser.add_argument("--keymapfile", type=str, default="keymap.json", help="Archivo keymap a cargar (default: keymap.json).")
+    parser.add_argument("--line-breaking", choices=LINE_BREAKING, default="greedy", help="Reparto de palabras en líneas: greedy llena cada línea; optimal las empareja y parte las palabras demasiado largas (default: greedy).")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Número de procesos del pool (default: número de CPUs).")
+    parser.add_argument("--force", action="store_true", help="Regenera todas las salidas aunque estén al día.")
+
+    args = parser.parse_args()
+
+    inputs = collect_inputs(args.sources, args.manifest)
+    if not inputs:
+        print("No se encontraron archivos de entrada.")
+        return
+
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    # Opciones que cambian las salidas; el reparto en líneas no afecta al abecedario
+    options = {
+        "backend": args.backend,
+        "keymapfile": os.path.abspath(args.keymapfile),
+        "size": args.size,
+        "letter_spacing": args.letter_spacing,
+        "line_spacing": args.line_spacing,
+    }
+    abc_digest = options_digest(options)
+    text_digest = options_digest(dict(options, line_breaking=args.line_breaking))
+
+    # Cada entrada depende de sí misma y del keymap
+    targets = []
+    for input_file in inputs:
+        output_base = os.path.join(args.output_dir, os.path.splitext(os.path.basename(input_file))[0])
+        outputs = [f"{output_base}.pdf"]
+        if not args.no_decoded:
+            outputs.append(f"{output_base}_decoded.pdf")
+        job = (encode_file, input_file, output_base, args.no_decoded, args.letter_spacing, args.line_spacing, args.line_breaking)
+        targets.append((input_file, outputs, [input_file, args.keymapfile], text_digest, job))
+
+    if not args.no_abc:
+        abc_filename = os.path.join(args.output_dir, "abc.pdf")
+        job = (encode_abc, abc_filename, args.letter_spacing, args.line_spacing)
+        targets.append(("abecedario", [abc_filename], [args.keymapfile], abc_digest, job))
+
+    # Dos orígenes que escriben la misma salida se pisarían: no se genera nada
+    collisions = find_collisions((output, source) for source, outputs, *_ in targets for output in outputs)
+    if collisions:
+        parser.error("salidas con el mismo nombre:\n" + "\n".join(
+            f"  {output}: {', '.join(sources)}" for output, sources in collisions
+        ))
+
+    stamp_filename = os.path.join(args.output_dir, STAMP_FILENAME)
+    stamps = load_stamps(stamp_filename)
+    jobs = []
+    for source, outputs, dependencies, digest, job in targets:
+        if not args.force and is_up_to_date(outputs, dependencies, stamps, digest):
+            print(f"Al día, se omite: {source}")
+            continue
+        jobs.append((source, outputs, digest, job))
+
+    if not jobs:
+        print("Todas las salidas están al día.")
+        return
+
+    # Sin keymap no se puede generar ninguna salida; el error ya se informó al cargarlo
+    try:
+        encoder = load_encoder(args.backend, args.keymapfile, args.size)
+    except (OSError, ValueError):
+        sys.exit(1)
+
+    # Una salida sólo vuelve a figurar al día cuando su trabajo termina bien
+    for source, outputs, digest, job in jobs:
+        for output in outputs:
+            stamps.pop(os.path.basename(output), None)
+
+    failed = []
+    try:
+        if args.jobs <= 1:
+            init_worker(encoder)
+            for source, outputs, digest, (function, *job_args) in jobs:
+                record_result(source, outputs, digest, lambda: function(*job_args), stamps, failed)
+        else:
+            with ProcessPoolExecutor(max_workers=args.jobs, initializer=init_worker, initargs=(encoder,)) as pool:
+                futures = [(source, outputs, digest, pool.submit(function, *job_args)) for source, outputs, digest, (function, *job_args) in jobs]
+                for source, outputs, digest, future in futures:
+                    record_result(source, outputs, digest, future.result, stamps, failed)
+    finally:
+        save_stamps(stamps, stamp_filename)
+
+    if failed:
+        print(f"Fallaron {len(failed)} de {len(jobs)} trabajos:\n  " + "\n  ".join(failed))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
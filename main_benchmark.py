@@ -0,0 +1,293 @@
+# main_benchmark.py
+
+# -*- coding: utf-8 -*-
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+from contextlib import redirect_stdout
+from EncoderJobs import load_encoder
+
+# Vocabulario para el texto sintético: acentos, eñes, mayúsculas y signos como en un ejercicio real
+WORDS = (
+    "el la los las un una de del en con por para sin sobre entre hacia desde "
+    "niño niña año mañana señor señora corazón canción lección acción razón "
+    "árbol lápiz fácil difícil rápido último música pájaro teléfono miércoles "
+    "está también después aquí allí así más qué cómo cuándo dónde porqué "
+    "casa perro gato libro escuela maestro alumno ejercicio palabra triángulo "
+    "cifrar descifrar mensaje secreto clave letra símbolo trazo línea página "
+    "Guatemala México España Perú Chile Colombia Argentina Costa Rica"
+).split()
+PUNCTUATION = ("", "", "", "", ",", ".", ";", ":", "?", "!")
+
+SIZES = {"1K": 1 << 10, "10K": 10 << 10, "100K": 100 << 10, "1M": 1 << 20, "10M": 10 << 20}
+BACKENDS = ("reportlab", "matplotlib")
+SCRIPTS = {"reportlab": "main_reportlab.py", "matplotlib": "main.py"}
+
+
+def parse_size(value):
+    """Convierte '10K', '1M' o un número de bytes en bytes."""
+    value = value.strip().upper()
+    if value in SIZES:
+        return SIZES[value]
+    multiplier = {"K": 1 << 10, "M": 1 << 20}.get(value[-1:], 1)
+    return int(float(value.rstrip("KM")) * multiplier)
+
+
+def size_label(size):
+    for label, value in SIZES.items():
+        if value == size:
+            return label
+    return str(size)
+
+
+def synthetic_text(size, seed=0):
+    """
+    Genera un texto en español de `size` bytes (UTF-8) como lista de líneas,
+    siempre el mismo para una misma semilla.
+    """
+    rng = random.Random(seed)
+    lines = []
+    total = 0
+    while total < size:
+        if rng.random() < 0.08:
+            line = ""
+        else:
+            words = [rng.choice(WORDS) + rng.choice(PUNCTUATION) for _ in range(rng.randint(3, 16))]
+            line = " ".join(words)
+        lines.append(line)
+        total += len(line.encode("utf-8")) + 1
+    return lines
+
+
+def measure(function, repeat, memory):
+    """
+    Ejecuta `function` `repeat` veces y devuelve (mejor tiempo, pico de memoria, último resultado).
+    El pico se mide en una ejecución aparte con tracemalloc para no alterar los tiempos.
+    """
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            result = function()
+        best = min(best, time.perf_counter() - start)
+
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            with redirect_stdout(io.StringIO()):
+                function()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return best, peak, result
+
+
+def normalize_stage(encoder, lines):
+    def run():
+        for line in lines:
+            encoder.glyphs.encode_line(line)
+    return run
+
+
+def layout_stage(encoder, lines, letter_spacing):
+    return lambda: encoder.layout_text(lines, letter_spacing=letter_spacing)
+
+
+def reportlab_stages(encoder, layout, letter_spacing, line_spacing):
+    """Emisión de glifos al canvas y c.save(), con un canvas nuevo por ejecución."""
+    def emit():
+        c = encoder.new_canvas(io.BytesIO())
+        encoder.draw_text(c, layout, letter_spacing=letter_spacing, line_spacing=line_spacing)
+        return c
+
+    def save():
+        c = emit()
+        start = time.perf_counter()
+        c.save()
+        return time.perf_counter() - start
+
+    return emit, save
+
+
+def matplotlib_stages(encoder, layout, letter_spacing, line_spacing):
+    """Dibujo de cada figura y savefig al PDF, medidos por separado página a página."""
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    def emit():
+        for page in encoder.draw_text(layout, letter_spacing=letter_spacing, line_spacing=line_spacing):
+            plt.close(encoder.page_figure(*page))
+
+    def save():
+        elapsed = 0.0
+        with PdfPages(io.BytesIO(), metadata={'CreationDate': None}) as pdf:
+            for page in encoder.draw_text(layout, letter_spacing=letter_spacing, line_spacing=line_spacing):
+                fig = encoder.page_figure(*page)
+                start = time.perf_counter()
+                pdf.savefig(fig, bbox_inches='tight', dpi=300)
+                elapsed += time.perf_counter() - start
+                plt.close(fig)
+        return elapsed
+
+    return emit, save
+
+
+def run_cli(backend, input_file, output_base, keymap_file):
+    command = [sys.executable, SCRIPTS[backend], "-i", input_file, "-o", output_base, "--no-abc", "--keymapfile", keymap_file]
+    start = time.perf_counter()
+    subprocess.run(command, cwd=os.path.dirname(os.path.abspath(__file__)), stdout=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - start
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_file, threshold, min_seconds):
+    """
+    Compara con un JSON anterior y devuelve las etapas más lentas que
+    `threshold` veces la referencia (y al menos `min_seconds` más lentas).
+    """
+    with open(baseline_file, "r") as file:
+        baseline = {
+            (entry["size"], entry["backend"], entry["stage"]): entry["seconds"]
+            for entry in json.load(file)["results"]
+        }
+
+    regressions = []
+    for entry in results:
+        reference = baseline.get((entry["size"], entry["backend"], entry["stage"]))
+        if reference is None:
+            continue
+        ratio = entry["seconds"] / reference if reference > 0 else float("inf")
+        if ratio > threshold and entry["seconds"] - reference > min_seconds:
+            regressions.append((entry, reference, ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mide el tiempo y la memoria de cada etapa del cifrado con textos sintéticos.")
+
+    parser.add_argument("--sizes", type=str, default="1K,10K,100K,1M,10M", help="Tamaños de texto separados por coma (default: 1K,10K,100K,1M,10M).")
+    parser.add_argument("--backends", type=str, default=",".join(BACKENDS), help="Backends a medir (default: reportlab,matplotlib).")
+    parser.add_argument("--render-limit", type=parse_size, default=SIZES["1M"], help="Tamaño máximo para dibujar y guardar con ReportLab (default: 1M).")
+    parser.add_argument("--matplotlib-limit", type=parse_size, default=SIZES["100K"], help="Tamaño máximo para dibujar y guardar con matplotlib (default: 100K).")
+    parser.add_argument("--cli-limit", type=parse_size, default=SIZES["100K"], help="Tamaño máximo para las ejecuciones completas del CLI (default: 100K).")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones por etapa; se guarda el mejor tiempo (default: 3).")
+    parser.add_argument("--no-memory", action="store_true", help="No mide el pico de memoria (ahorra una ejecución por etapa).")
+    parser.add_argument("--size", type=int, default=50, help="Tamaño de la letra. Por defecto es 50.")
+    parser.add_argument("--letter-spacing", type=float, default=0.4, help="Espacio entre letras.")
+    parser.add_argument("--line-spacing", type=float, default=0.6, help="Espacio entre líneas.")
+    parser.add_argument("--keymapfile", type=str, default="keymap.json", help="Archivo keymap a cargar (default: keymap.json).")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla del texto sintético (default: 0).")
+    parser.add_argument("-o", type=str, help="Archivo JSON donde guardar los resultados.")
+    parser.add_argument("--baseline", type=str, help="JSON de una ejecución anterior con el que comparar.")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Con --baseline, falla si una etapa tarda más de este factor (default: 1.25).")
+    parser.add_argument("--min-seconds", type=float, default=0.005, help="Con --baseline, ignora diferencias menores a estos segundos (default: 0.005).")
+
+    args = parser.parse_args()
+
+    backends = [backend.strip() for backend in args.backends.split(",") if backend.strip()]
+    for backend in backends:
+        if backend not in BACKENDS:
+            parser.error(f"Backend desconocido: '{backend}'")
+    sizes = [parse_size(size) for size in args.sizes.split(",") if size.strip()]
+    limits = {"reportlab": args.render_limit, "matplotlib": args.matplotlib_limit}
+    memory = not args.no_memory
+
+    results = []
+
+    def record(size, backend, stage, seconds, peak=None, **extra):
+        entry = {"size": size_label(size), "bytes": size, "backend": backend, "stage": stage, "seconds": seconds, "peak_bytes": peak, **extra}
+        results.append(entry)
+        peak_text = f"{peak / (1 << 20):9.1f} MB" if peak is not None else " " * 12
+        print(f"{entry['size']:>6} {backend:<11} {stage:<10} {seconds * 1000:11.1f} ms {peak_text}")
+
+    print(f"{'tamaño':>6} {'backend':<11} {'etapa':<10} {'tiempo':>14} {'memoria':>12}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            lines = synthetic_text(size, args.seed)
+            input_file = os.path.join(workdir, f"input_{size}.txt")
+            with open(input_file, "w", encoding="utf-8") as file:
+                file.write("\n".join(lines))
+
+            # Los archivos grandes se miden una sola vez: la variación relativa es pequeña
+            repeat = args.repeat if size < SIZES["1M"] else 1
+
+            for backend in backends:
+                with redirect_stdout(io.StringIO()):
+                    encoder = load_encoder(backend, args.keymapfile, args.size)
+
+                seconds, peak, _ = measure(normalize_stage(encoder, lines), repeat, memory)
+                record(size, backend, "normalize", seconds, peak)
+
+                seconds, peak, layout = measure(layout_stage(encoder, lines, args.letter_spacing), repeat, memory)
+                record(size, backend, "layout", seconds, peak, glyphs=len(layout))
+
+                if size <= limits[backend]:
+                    stages = reportlab_stages if backend == "reportlab" else matplotlib_stages
+                    emit, save = stages(encoder, layout, args.letter_spacing, args.line_spacing)
+
+                    seconds, peak, _ = measure(emit, repeat, memory)
+                    record(size, backend, "emit", seconds, peak)
+
+                    # save devuelve sólo el tiempo de guardado; el resto es la emisión previa
+                    saves = []
+                    for _ in range(repeat):
+                        with redirect_stdout(io.StringIO()):
+                            saves.append(save())
+                    record(size, backend, "save", min(saves))
+
+                if size <= min(args.cli_limit, limits[backend]):
+                    runs = [run_cli(backend, input_file, os.path.join(workdir, "output"), args.keymapfile) for _ in range(repeat)]
+                    record(size, backend, "cli", min(runs))
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "seed": args.seed,
+            "size": args.size,
+            "letter_spacing": args.letter_spacing,
+            "line_spacing": args.line_spacing,
+        },
+        "results": results,
+    }
+
+    if args.o:
+        with open(args.o, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"Resultados guardados en {args.o}")
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.threshold, args.min_seconds)
+        for entry, reference, ratio in regressions:
+            print(f"Regresión: {entry['size']} {entry['backend']} {entry['stage']}: "
+                  f"{reference * 1000:.1f} ms -> {entry['seconds'] * 1000:.1f} ms (x{ratio:.2f})")
+        if regressions:
+            sys.exit(1)
+        print("Sin regresiones respecto a la referencia.")
+
+
+if __name__ == "__main__":
+    main()
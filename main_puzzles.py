@@ -0,0 +1,131 @@
+# main_puzzles.py
+
+# -*- coding: utf-8 -*-
+import os
+import copy
+import json
+import random
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from GlyphTable import DEFAULT_LINES_MAP
+from EncoderJobs import load_encoder
+from KeymapCache import compile_glyphs
+from LineBreaker import LINE_BREAKING
+from TextLayout import TextLayout
+
+# Encoder base y layout del proceso actual; en el pool se reciben una sola vez por worker
+_encoder = None
+_layout = None
+
+def init_worker(encoder, layout):
+    """Guarda el encoder base y el layout compartido en el proceso del pool."""
+    global _encoder, _layout
+    _encoder = encoder
+    _layout = layout
+
+def stroke_subsets(stroke_names):
+    """Todas las combinaciones no vacías de trazos (31 con los cinco trazos por defecto)."""
+    return [
+        [name for bit, name in enumerate(stroke_names) if mask >> bit & 1]
+        for mask in range(1, 1 << len(stroke_names))
+    ]
+
+def random_keymap(letters, stroke_names, seed):
+    """
+    Asigna a cada letra una combinación de trazos distinta, al azar.
+    La misma semilla da siempre el mismo keymap.
+    """
+    subsets = stroke_subsets(sorted(stroke_names))
+    if len(letters) > len(subsets):
+        raise ValueError(f"Hay {len(letters)} letras y sólo {len(subsets)} combinaciones de trazos.")
+    rng = random.Random(seed)
+    return dict(zip(sorted(letters), rng.sample(subsets, len(letters))))
+
+def variant_seed(seed, index):
+    """Semilla de una variante: no depende de cuántas variantes se generen."""
+    return f"{seed}:{index}"
+
+def save_keymap(keymap, lines_map, filename):
+    """Guarda el keymap de una variante; los trazos sólo se escriben si no son los de por defecto."""
+    data = keymap
+    if lines_map != DEFAULT_LINES_MAP:
+        data = {"strokes": lines_map, "letters": keymap}
+    with open(filename, "w", encoding="utf-8") as file:
+        json.dump(data, file, indent=4, ensure_ascii=False)
+
+def render_variant(index, seed, output_base, letter_spacing, line_spacing):
+    """
+    Genera el keymap de una variante y sus tres salidas (texto cifrado,
+    abecedario y solución) con el layout compartido: el keymap aleatorio
+    tiene las mismas letras, así que los ids de glifo no cambian.
+    """
+    keymap_file = f"{output_base}_keymap.json"
+    keymap = random_keymap(_encoder.glyphs.chars, _encoder.glyphs.lines_map, variant_seed(seed, index))
+    save_keymap(keymap, _encoder.glyphs.lines_map, keymap_file)
+
+    encoder = copy.copy(_encoder)
+    encoder.keymap_file = keymap_file
+    encoder.keymap, encoder.glyphs = compile_glyphs(lambda: keymap, _encoder.glyphs.lines_map, _encoder.size)
+
+    encoder.render_output('encoded', f"{output_base}.pdf", _layout, letter_spacing, line_spacing)
+    encoder.render_output('abc', f"{output_base}_abc.pdf", letter_spacing=letter_spacing, line_spacing=line_spacing)
+    encoder.render_output('solution', f"{output_base}_decoded.pdf", _layout, letter_spacing, line_spacing)
+    return output_base
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera hojas de ejercicios, cada una con un keymap aleatorio distinto.")
+
+    parser.add_argument("-i", required=True, type=str, help="Archivo de texto con el contenido a cifrar.")
+    parser.add_argument("-n", type=int, default=30, help="Número de variantes a generar (default: 30).")
+    parser.add_argument("--first", type=int, default=1, help="Número de la primera variante; sirve para regenerar una sola (default: 1).")
+    parser.add_argument("--seed", type=str, default="0", help="Semilla del lote: la misma semilla da los mismos keymaps (default: 0).")
+    parser.add_argument("--output-dir", type=str, default="output", help="Directorio de salida (default: output).")
+    parser.add_argument("--name", type=str, default="variante", help="Prefijo de los archivos de cada variante (default: variante).")
+    parser.add_argument("--backend", choices=["reportlab", "matplotlib"], default="reportlab", help="Backend de dibujo (default: reportlab).")
+    parser.add_argument("--size", type=int, default=50, help="Tamaño de la letra. Por defecto es 50.")
+    parser.add_argument("--letter-spacing", type=float, default=0.4, help="Espacio entre letras.")
+    parser.add_argument("--line-spacing", type=float, default=0.6, help="Espacio entre líneas.")
+    parser.add_argument("--keymapfile", type=str, default="keymap.json", help="Keymap con las letras y los trazos a usar (default: keymap.json).")
+    parser.add_argument("--line-breaking", choices=LINE_BREAKING, default="greedy", help="Reparto de palabras en líneas: greedy llena cada línea; optimal las empareja y parte las palabras demasiado largas (default: greedy).")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Número de procesos del pool (default: número de CPUs).")
+
+    args = parser.parse_args()
+
+    if args.n < 1:
+        parser.error("-n debe ser al menos 1.")
+
+    encoder = load_encoder(args.backend, args.keymapfile, args.size)
+    subsets = (1 << len(encoder.glyphs.lines_map)) - 1
+    if len(encoder.glyphs) > subsets:
+        parser.error(f"El keymap tiene {len(encoder.glyphs)} letras y sólo hay {subsets} combinaciones de trazos.")
+
+    # El texto se lee y se reparte en líneas una sola vez para todas las variantes
+    try:
+        input_content = encoder.read_file_content(args.i)
+        layout = encoder.layout_text(input_content, letter_spacing=args.letter_spacing, line_breaking=args.line_breaking)
+    except UnicodeDecodeError:
+        return
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    jobs = [
+        (index, args.seed, os.path.join(args.output_dir, f"{args.name}_{index:03d}"), args.letter_spacing, args.line_spacing)
+        for index in range(args.first, args.first + args.n)
+    ]
+
+    if args.jobs <= 1:
+        init_worker(encoder, layout)
+        for job in jobs:
+            print(f"Generado: {render_variant(*job)}")
+        return
+
+    # Los workers reciben el layout como archivo mapeado en memoria, no una copia
+    with tempfile.TemporaryDirectory() as workdir:
+        layout = TextLayout.load(layout.save(os.path.join(workdir, "layout.bin")))
+        with ProcessPoolExecutor(max_workers=args.jobs, initializer=init_worker, initargs=(encoder, layout)) as pool:
+            futures = [pool.submit(render_variant, *job) for job in jobs]
+            for future in futures:
+                print(f"Generado: {future.result()}")
+
+if __name__ == "__main__":
+    main()
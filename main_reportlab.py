@@ -1,25 +1,16 @@
 # main.py
 
 # -*- coding: utf-8 -*-
+import os
 import argparse
-from SymbolicEncoderReportLab import SymbolicEncoder
-
-def read_file_content(input_file):
-    """Lee el contenido de un archivo de texto y lo devuelve como una lista de líneas."""
-    try:
-        with open(input_file, "r") as file:
-            content = file.readlines()
-        print("Contenido leído:", content)
-        return content
-    except FileNotFoundError:
-        print(f"El archivo {input_file} no se encuentra.")
-        raise
-    except Exception as e:
-        print(f"Error al leer el archivo de texto: {e}")
-        raise
+import tempfile
+from InputReader import read_lines
+from LineBreaker import LINE_BREAKING
+from Instrumentation import instrumentation, configure_logging
+from EncoderJobs import load_encoder, run_jobs
 
 def main():
-    parser = argparse.ArgumentParser(description="Genera un PDF con texto cifrado utilizando ReportLab.")
+    parser = argparse.ArgumentParser(description="Genera un PDF con texto cifrado utilizando ReportLab. El PDF se reescribe entero en cada ejecución: a diferencia de main.py, no reusa páginas sin cambios.")
 
     parser.add_argument("-o", required=True, type=str, help="Nombre base del archivo de salida (sin extensión).")
     parser.add_argument("-i", required=True, type=str, help="Archivo de texto con el contenido a cifrar.")
@@ -29,47 +20,70 @@ def main():
     parser.add_argument("--letter-spacing", type=float, default=0.4, help="Espacio entre letras.")
     parser.add_argument("--line-spacing", type=float, default=0.6, help="Espacio entre líneas.")
     parser.add_argument("--keymapfile", type=str, default="keymap.json", help="Archivo keymap a cargar (default: keymap.json).")
+    parser.add_argument("--line-breaking", choices=LINE_BREAKING, default="greedy", help="Reparto de palabras en líneas: greedy llena cada línea; optimal las empareja y parte las palabras demasiado largas (default: greedy).")
+    parser.add_argument("--jobs", type=int, default=1, help="Número de procesos para generar las salidas en paralelo (default: 1).")
+    parser.add_argument("--stats", choices=["off", "summary", "json"], default="off", help="Muestra tiempos por etapa y contadores al terminar: resumen o una línea JSON (default: off).")
 
     args = parser.parse_args()
+    configure_logging(args.stats)
 
     try:
-        input_content = read_file_content(args.i)
+        input_content = read_lines(args.i)
     except Exception as e:
         print(f"Error al leer el archivo de texto: {e}")
         return
 
-    encoder = SymbolicEncoder(
-        keymap_file=args.keymapfile,
-        size=args.size
-    )
+    # El backend se importa sólo cuando se va a usar
+    encoder = load_encoder("reportlab", args.keymapfile, args.size)
+
+    # El texto se reparte en líneas una sola vez para todas las salidas
+    try:
+        layout = encoder.layout_text(input_content, letter_spacing=args.letter_spacing, line_breaking=args.line_breaking)
+    except UnicodeDecodeError:
+        return
+
+    # Con varios procesos el layout se guarda en un archivo mapeado en memoria:
+    # cada worker recibe sólo la ruta en vez de una copia de los arreglos
+    shared = None
+    if args.jobs > 1:
+        from TextLayout import TextLayout
+
+        shared = tempfile.TemporaryDirectory()
+        layout = TextLayout.load(layout.save(os.path.join(shared.name, "layout.bin")))
+
+    jobs = []
 
     # Generar abecedario
     if not args.no_abc:
-        print("Generando abecedario...")
-        encoder.generate_abc(
+        jobs.append(("Generando abecedario...", encoder.generate_abc, dict(
             output_filename=f"{args.o}_abc.pdf",
             letter_spacing=args.letter_spacing,
             line_spacing=args.line_spacing
-        )
+        )))
 
     # Generar texto con solución (letras debajo)
     if not args.no_decoded:
-        print("Generando texto con letras debajo...")
-        encoder.generate_text_solution(
-            input_content,
+        jobs.append(("Generando texto con letras debajo...", encoder.generate_text_solution, dict(
+            input_content=layout,
             output_filename=f"{args.o}_decoded.pdf",
             letter_spacing=args.letter_spacing,
             line_spacing=args.line_spacing
-        )
+        )))
 
     # Generar texto codificado puro
-    print("Generando texto cifrado puro...")
-    encoder.generate_text_encoded(
-        input_content,
+    jobs.append(("Generando texto cifrado puro...", encoder.generate_text_encoded, dict(
+        input_content=layout,
         output_filename=f"{args.o}.pdf",
         letter_spacing=args.letter_spacing,
         line_spacing=args.line_spacing
-    )
+    )))
+
+    try:
+        run_jobs(jobs, args.jobs)
+    finally:
+        if shared is not None:
+            shared.cleanup()
+    instrumentation.report()
 
 if __name__ == "__main__":
     main()
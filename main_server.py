@@ -0,0 +1,51 @@
+# main_server.py
+
+# -*- coding: utf-8 -*-
+import asyncio
+import argparse
+from EncodeService import EncodeService
+from RenderCache import RenderCache
+
+def parse_keymap(value):
+    """Convierte 'nombre=archivo' (o sólo 'archivo') en (nombre, archivo)."""
+    name, separator, path = value.partition("=")
+    return (name, path) if separator else ("default", value)
+
+def main():
+    parser = argparse.ArgumentParser(description="Servicio HTTP local que cifra texto con los encoders ya cargados.")
+
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Dirección donde escuchar (default: 127.0.0.1).")
+    parser.add_argument("--port", type=int, default=8765, help="Puerto donde escuchar (default: 8765).")
+    parser.add_argument("--keymap", type=parse_keymap, action="append", help="Keymap disponible como nombre=archivo; se puede repetir (default: default=keymap.json).")
+    parser.add_argument("--workers", type=int, default=4, help="Hilos del pool de dibujo (default: 4).")
+    parser.add_argument("--max-concurrent", type=int, default=8, help="Peticiones de cifrado en curso como máximo (default: 8).")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Tiempo máximo por petición en segundos (default: 30).")
+    parser.add_argument("--size", type=int, action="append", help="Tamaño de letra a cargar al arrancar; se puede repetir (default: 50).")
+    parser.add_argument("--cache-size", type=int, default=64, help="MB de salidas guardadas en memoria; 0 desactiva la caché (default: 64).")
+    parser.add_argument("--cache-dir", type=str, help="Directorio donde guardar también las salidas en disco.")
+    parser.add_argument("--cache-disk-size", type=int, default=512, help="MB de salidas guardadas en disco (default: 512).")
+
+    args = parser.parse_args()
+
+    cache = None
+    if args.cache_size > 0:
+        cache = RenderCache(args.cache_size << 20, args.cache_dir, args.cache_disk_size << 20)
+
+    service = EncodeService(
+        keymaps=dict(args.keymap or [("default", "keymap.json")]),
+        workers=args.workers,
+        max_concurrent=args.max_concurrent,
+        timeout=args.timeout,
+        cache=cache,
+    )
+    service.warm(args.size or [50])
+
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("Servicio detenido.")
+    finally:
+        service.close()
+
+if __name__ == "__main__":
+    main()